@@ -0,0 +1,67 @@
+#----------------------------------------------------------------------------#
+# JSON API.
+#----------------------------------------------------------------------------#
+
+import hashlib
+import json
+from datetime import date, datetime
+
+from flask import Response, current_app, request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError('{!r} is not JSON serializable'.format(value))
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data, default=_default)
+    return json.dumps(data, default=_default, separators=(',', ':')).encode('utf-8')
+
+
+def make_etag(*parts):
+    source = '|'.join(str(part) for part in parts)
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+
+def is_not_modified(etag, last_modified):
+    # If-None-Match wins over If-Modified-Since when both are sent (RFC 7232).
+    # It uses the weak comparison: compression weakens the ETag it sent.
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    if since and last_modified:
+        return last_modified.replace(microsecond=0) <= since.replace(tzinfo=None)
+    return False
+
+
+def json_response(data, status=200, etag=None, last_modified=None):
+    response = Response(dumps(data) if data is not None else b'', status=status,
+                        mimetype='application/json')
+    if etag:
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.headers['Cache-Control'] = current_app.config['API_CACHE_CONTROL']
+    return response
+
+
+def conditional_json(version, load):
+    # `version` is a cheap row describing everything the payload depends on;
+    # the payload itself is only loaded and serialized when the client's copy
+    # is stale.
+    if version is None:
+        return json_response({"error": "not found"}, 404)
+    etag = make_etag(request.path, *version)
+    if is_not_modified(etag, version.last_modified):
+        return json_response(None, 304, etag, version.last_modified)
+    data = load()
+    if data is None:
+        return json_response({"error": "not found"}, 404)
+    return json_response(data, 200, etag, version.last_modified)
@@ -3,47 +3,109 @@
 #----------------------------------------------------------------------------#
 
 #import json
-import dateutil.parser
-import babel
 from flask import (
   Flask, 
+  Blueprint,
+  current_app,
   render_template, 
   request, 
   Response, 
   flash, 
   redirect, 
-  url_for
+  url_for,
+  abort,
+  jsonify,
+  stream_with_context
 )
-from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 import logging
+import os
+from datetime import datetime, timedelta, timezone
 from logging import Formatter, FileHandler
-from flask_wtf import Form
-from forms import *
-from flask_migrate import Migrate
+# forms.py (and wtforms with it) is imported inside the form views: most
+# requests never need it.
 from models import *
-from sqlalchemy import func, desc
+from queries import (
+  venue_areas,
+  artist_rows,
+  busiest_artist_rows,
+  decode_count_cursor,
+  stream_artist_rows,
+  search,
+  venue_detail,
+  venue_version,
+  artist_detail,
+  artist_version,
+  show_detail,
+  show_version,
+  show_tiles,
+  decode_show_cursor,
+  venue_availability,
+  browse,
+  facet_summary,
+  facet_summary_key
+)
+from sqlalchemy import desc
+from sqlalchemy.exc import IntegrityError
+# Registers the ORM listeners that keep the show counters up to date.
+import counters
+from api import conditional_json, json_response
+from engine import configure_engine, pool_stats
+from routing import read_only
+import assets
+import formatting
+import templating
+
 
+bp = Blueprint('main', __name__)
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
+def stream_template(template_name, **context):
+  # Renders a template incrementally for use with a streamed Response.
+  current_app.update_template_context(context)
+  template = current_app.jinja_env.get_template(template_name)
+  stream = template.stream(context)
+  stream.enable_buffering(50)
+  return stream
+
+def browse_filters():
+  # ?genre=Jazz&genre=Folk&state=CA&city=San+Francisco&seeking=1; see
+  # queries._browse_filter() for what each one matches.
+  return {
+    "genre": [genre for genre in request.args.getlist('genre') if genre],
+    "state": request.args.get('state') or None,
+    "city": request.args.get('city') or None,
+    "seeking": request.args.get('seeking') == '1'
+  }
 
-app.jinja_env.filters['datetime'] = format_datetime
+def browse_page(entity, endpoint):
+  filters = browse_filters()
+  after = request.args.get('after', type=int)
+  data, next_cursor = browse(entity, filters, current_app.config['BROWSE_RESULTS_PER_PAGE'], after)
+  # The filters as query arguments, for the links that add or remove one.
+  query = dict(filters, seeking=1 if filters['seeking'] else None)
+  return render_template('pages/browse.html', entity=entity.__tablename__.lower(), endpoint=endpoint,
+                         results=data, next_cursor=next_cursor, filters=filters, query=query,
+                         facets=facet_summary(entity, filters))
+
+def browse_json(entity):
+  filters = browse_filters()
+  after = request.args.get('after', type=int)
+  data, next_cursor = browse(entity, filters, current_app.config['BROWSE_RESULTS_PER_PAGE'], after)
+  return json_response({
+    "data": [dict(row._mapping) for row in data],
+    "next_cursor": next_cursor,
+    "facets": facet_summary(entity, filters)
+  })
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
+@bp.route('/')
+@page_cache.cached('home')
 def index():
   venues = Venue.query.order_by(desc(Venue.id)).limit(10).all()
   artists = Artist.query.order_by(desc(Artist.id)).limit(10).all()
@@ -53,109 +115,49 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
+@bp.route('/venues')
 def venues():
-  data = []
-  all_locations = Venue.query.with_entities(Venue.city, Venue.state, func.count(Venue.id)).group_by(Venue.city, Venue.state).all()
-
-  for location in all_locations:
-    query_data = Venue.query.filter_by(state=location.state).filter_by(city=location.city).all()
-    current_venues = []
-    for loc in query_data:
-      current_venues.append(
-        {
-          "id":loc.id,
-          "name":loc.name
-        }
-      )
-    data.append(
-      {
-        "city": location.city,
-        "state": location.state,
-        "venues": current_venues
-      }
-    )     
+  data = venue_areas()
   return render_template('pages/venues.html', areas=data)
 
-@app.route('/venues/search', methods=['POST'])
+@bp.route('/venues/browse')
+def browse_venues():
+  return browse_page(Venue, 'main.browse_venues')
+
+@bp.route('/venues/search', methods=['GET', 'POST'])
+@read_only
 def search_venues():
   # implement search on artists with partial string search. Ensure it is case-insensitive.
   # seach for Hop should return "The Musical Hop".
   # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-  q = request.form.get('search_term', '')
-  venues = db.session.query(Venue).filter(Venue.name.ilike('%' + q + '%')).all()
-  response={
-        "count": len(venues),
-        "data": venues
-    }
+  q = request.values.get('search_term', '')
+  page = request.values.get('page', 1, type=int)
+  response = search(Venue, q, max(page, 1), current_app.config['SEARCH_RESULTS_PER_PAGE'])
 
   return render_template('pages/search_venues.html', results=response, search_term=q)
   
 
-@app.route('/venues/<int:venue_id>')
+@bp.route('/venues/<int:venue_id>')
 def show_venue(venue_id):
   # shows the venue page with the given venue_id
-
-  venue = Venue.query.get(venue_id)
-  if not venue:
+  data = venue_detail(venue_id)
+  if not data:
     return render_template('errors/404.html')
 
-  upcoming_shows_query = db.session.query(Show).join(Artist).filter(Show.venue_id==venue_id).filter(Show.start_time>datetime.now()).all()
-  past_shows_query = db.session.query(Show).join(Artist).filter(Show.venue_id==venue_id).filter(Show.start_time<datetime.now()).all()
-  
-  upcoming_shows = []
-  past_shows = []
-  for show in upcoming_shows_query:
-    temp = {  
-      "venue_id": venue_id,
-      "artist_id": show.artist_id,
-      "artist_name": show.artist.name,
-      "artist_image_link": show.artist.image_link,
-      "start_time": str(show.start_time)
-    }
-    upcoming_shows.append(temp)
-
-  for show in past_shows_query:
-    temp = {  
-      "venue_id": venue_id,
-      "artist_id": show.artist_id,
-      "artist_name": show.artist.name,
-      "artist_image_link": show.artist.image_link,
-      "start_time": str(show.start_time)
-    }
-    past_shows.append(temp)
-
-  data={
-    "id": venue.id,
-    "name": venue.name,
-    "genres": venue.genres,
-    "address": venue.address,
-    "city": venue.city,
-    "state": venue.state,
-    "phone": venue.phone,
-    "website": venue.website,
-    "facebook_link": venue.facebook_link,
-    "seeking_talent": venue.seeking_talent,
-    "seeking_description": venue.seeking_description,
-    "image_link": venue.image_link,
-    "past_shows": past_shows,
-    "upcoming_shows": upcoming_shows,
-    "past_shows_count": len(past_shows),
-    "upcoming_shows_count": len(upcoming_shows) ,
-  }
-  
   return render_template('pages/show_venue.html', venue=data)
 
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@bp.route('/venues/create', methods=['GET'])
 def create_venue_form():
+  from forms import VenueForm
   form = VenueForm()
   return render_template('forms/new_venue.html', form=form)
 
-@app.route('/venues/create', methods=['POST'])
+@bp.route('/venues/create', methods=['POST'])
 def create_venue_submission():
+  from forms import VenueForm
 
   form = VenueForm(request.form, meta={'csrf': False})
   if form.validate():
@@ -176,6 +178,7 @@ def create_venue_submission():
         website=website1, seeking_talent=seeking_talent1, seeking_description=seeking_description1)
       db.session.add(venue)
       db.session.commit()
+      page_cache.invalidate('home', facet_summary_key(Venue))
       # on successful db insert, flash success
       flash('Venue ' + request.form['name'] + ' was successfully listed!') 
     except:
@@ -193,7 +196,7 @@ def create_venue_submission():
 
   return render_template('pages/home.html')
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@bp.route('/venues/<venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
   # Complete this endpoint for taking a venue_id, and using
   # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
@@ -205,6 +208,7 @@ def delete_venue(venue_id):
     venue = Venue.query.get(venue_id)
     db.session.delete(venue)
     db.session.commit()
+    page_cache.invalidate('home', facet_summary_key(Venue))
   except:
     db.session.rollback()
     error = True
@@ -219,80 +223,59 @@ def delete_venue(venue_id):
   return render_template('pages/home.html')
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@bp.route('/artists')
 def artists():
-  data = Artist.query.all()
-  return render_template('pages/artists.html', artists=data)
-
-@app.route('/artists/search', methods=['POST'])
+  if request.args.get('all') == '1':
+    rows = stream_artist_rows(current_app.config['STREAM_BATCH_SIZE'])
+    return Response(stream_with_context(stream_template('pages/artists.html', artists=rows)))
+
+  if request.args.get('sort') == 'upcoming':
+    after = request.args.get('after')
+    if after:
+      try:
+        after = decode_count_cursor(after)
+      except ValueError:
+        abort(400)
+    data, next_cursor = busiest_artist_rows(current_app.config['ARTISTS_PER_PAGE'], after=after)
+    return render_template('pages/artists.html', artists=data, next_cursor=next_cursor, sort='upcoming')
+
+  after = request.args.get('after', type=int)
+  data, next_cursor = artist_rows(current_app.config['ARTISTS_PER_PAGE'], after=after)
+  return render_template('pages/artists.html', artists=data, next_cursor=next_cursor)
+
+@bp.route('/artists/browse')
+def browse_artists():
+  return browse_page(Artist, 'main.browse_artists')
+
+@bp.route('/artists/search', methods=['GET', 'POST'])
+@read_only
 def search_artists():
   # implement search on artists with partial string search. Ensure it is case-insensitive.
   # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
   # search for "band" should return "The Wild Sax Band".
 
-  q = request.form.get('search_term', '')
-  artists = db.session.query(Artist).filter(Artist.name.ilike('%' + q + '%')).all()
-  if not artists:
+  q = request.values.get('search_term', '')
+  page = request.values.get('page', 1, type=int)
+  response = search(Artist, q, max(page, 1), current_app.config['SEARCH_RESULTS_PER_PAGE'])
+  if not response['data']:
     return render_template('errors/404.html')
-
-  response={
-        "count": len(artists),
-        "data": artists
-    }
  
   return render_template('pages/search_artists.html', results=response, search_term=q)
 
-@app.route('/artists/<int:artist_id>')
+@bp.route('/artists/<int:artist_id>')
 def show_artist(artist_id):
   # shows the artist page with the given artist_id
-  query_artist = Artist.query.get(artist_id)
-  upcoming_shows_query =db.session.query(Show).join(Venue).filter(Show.artist_id==artist_id).filter(Show.start_time>datetime.now()).all()
-  past_shows_query =db.session.query(Show).join(Venue).filter(Show.artist_id==artist_id).filter(Show.start_time<datetime.now()).all()
-
-  upcoming_shows = []
-  past_shows = []
-  for show in upcoming_shows_query:
-    temp = {  
-      "venue_id": show.venue_id,
-      "venue_name": show.venue.name,
-      "venue_image_link": show.venue.image_link,
-      "start_time": str(show.start_time)
-    }
-    upcoming_shows.append(temp)
-
-  for show in past_shows_query:
-    temp = {  
-      "venue_id": show.venue_id,
-      "venue_name": show.venue.name,
-      "venue_image_link": show.venue.image_link,
-      "start_time": str(show.start_time)
-    }
-    past_shows.append(temp)    
-
-  data={
-    "id": artist_id,
-    "name": query_artist.name,
-    "genres": query_artist.genres,
-    "city": query_artist.city,
-    "state": query_artist.state,
-    "phone": query_artist.phone,
-    "website": query_artist.website,
-    "facebook_link": query_artist.facebook_link,
-    "seeking_venue": query_artist.seeking_venue,
-    "seeking_description": query_artist.seeking_description,
-    "image_link": query_artist.image_link,
-    "past_shows": past_shows,
-    "upcoming_shows": upcoming_shows,
-    "past_shows_count": len(past_shows),
-    "upcoming_shows_count": len(upcoming_shows),
-  }
+  data = artist_detail(artist_id)
+  if not data:
+    return render_template('errors/404.html')
 
   return render_template('pages/show_artist.html', artist=data)
 
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
+  from forms import ArtistForm
  
   artist = Artist.query.get(artist_id)
   
@@ -314,8 +297,9 @@ def edit_artist(artist_id):
   # TODO: populate form with fields from artist with ID <artist_id>
   return render_template('forms/edit_artist.html', form=form, artist=artist)
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
+  from forms import ArtistForm
   # take values from the form submitted, and update existing
   # artist record with ID <artist_id> using the new attributes
   form = ArtistForm(request.form, meta={'csrf': False})
@@ -333,6 +317,8 @@ def edit_artist_submission(artist_id):
       artist.seeking_venue = True if 'seeking_venue' in request.form else False
       artist.seeking_description = request.form['seeking_description']
       db.session.commit()
+      page_cache.invalidate('home', facet_summary_key(Artist))
+      fragment_cache.invalidate('artist', artist_id)
     except:
       db.session.rollback()  
       # on unsuccessful db update, flash an error instead.
@@ -344,10 +330,11 @@ def edit_artist_submission(artist_id):
     for field, err in form.errors.items():
         message.append(field + ' ' + err[0])
     flash('Errors ' + str(message))     
-  return redirect(url_for('show_artist', artist_id=artist_id))
+  return redirect(url_for('.show_artist', artist_id=artist_id))
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
+  from forms import VenueForm
   venue = Venue.query.get(venue_id)
   if not venue:
     return render_template('errors/404.html')
@@ -368,8 +355,9 @@ def edit_venue(venue_id):
 
   return render_template('forms/edit_venue.html', form=form, venue=venue)
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
+  from forms import VenueForm
   # TODO: take values from the form submitted, and update existing
   # venue record with ID <venue_id> using the new attributes
   form = VenueForm(request.form, meta={'csrf': False})
@@ -388,6 +376,7 @@ def edit_venue_submission(venue_id):
       venue.seeking_talent = True if 'seeking_talent' in request.form else False
       venue.seeking_description = request.form['seeking_description']
       db.session.commit()
+      page_cache.invalidate('home', facet_summary_key(Venue))
     except:
       db.session.rollback()  
       # TODO: on unsuccessful db update, flash an error instead.
@@ -400,18 +389,20 @@ def edit_venue_submission(venue_id):
         message.append(field + ' ' + err[0])
     flash('Errors ' + str(message))    
 
-  return redirect(url_for('show_venue', venue_id=venue_id))
+  return redirect(url_for('.show_venue', venue_id=venue_id))
 
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@bp.route('/artists/create', methods=['GET'])
 def create_artist_form():
+  from forms import ArtistForm
   form = ArtistForm()
   return render_template('forms/new_artist.html', form=form)
 
-@app.route('/artists/create', methods=['POST'])
+@bp.route('/artists/create', methods=['POST'])
 def create_artist_submission():
+  from forms import ArtistForm
   # called upon submitting the new artist listing form
   # insert form data as a new Venue record in the db, instead
   # modify data to be the data object returned from db insertion
@@ -433,6 +424,7 @@ def create_artist_submission():
         website=website1, seeking_venue=seeking_venue1, seeking_description=seeking_description1)
       db.session.add(artist)
       db.session.commit()
+      page_cache.invalidate('home', facet_summary_key(Artist))
       # on successful db insert, flash success
       flash('Artist ' + request.form['name'] + ' was successfully listed!') 
     except:
@@ -452,49 +444,64 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@bp.route('/shows')
 def shows():
-  # displays list of shows at /shows
-  # replace with real venues data.
-  #       num_shows should be aggregated based on number of upcoming shows per venue.
-  data=[]
-  all_shows = Show.query.all()  
-  if not all_shows:
+  # displays list of shows at /shows, one keyset page at a time
+  upcoming = request.args.get('upcoming') == '1'
+  after = request.args.get('after')
+  if after:
+    try:
+      after = decode_show_cursor(after)
+    except ValueError:
+      abort(400)
+
+  rows, next_cursor = show_tiles(current_app.config['SHOWS_PER_PAGE'], after=after, upcoming=upcoming)
+  if not rows and not after:
     return render_template('errors/404.html')
-  
-  for each in all_shows:
-    venue = Venue.query.get(each.venue_id)
-    artist = Artist.query.get(each.artist_id)
-    temp = {
-    "venue_id": venue.id,
-    "venue_name": venue.name,
-    "artist_id": artist.id,
-    "artist_name": artist.name,
-    "artist_image_link": artist.image_link,
-    "start_time": str(each.start_time)
-    }
-    data.append(temp)
-  return render_template('pages/shows.html', shows=data)
-
-@app.route('/shows/create')
+
+  data = []
+  for row in rows:
+    data.append({
+      "id": row.id,
+      "version": row.version,
+      "venue_id": row.venue_id,
+      "venue_name": row.venue_name,
+      "artist_id": row.artist_id,
+      "artist_name": row.artist_name,
+      "artist_image_link": row.artist_image_link,
+      "start_time": row.start_time
+    })
+  return render_template('pages/shows.html', shows=data, next_cursor=next_cursor, upcoming=upcoming)
+
+@bp.route('/shows/create')
 def create_shows():
+  from forms import ShowForm
   # renders form. do not touch.
   form = ShowForm()
   return render_template('forms/new_show.html', form=form)
 
-@app.route('/shows/create', methods=['POST'])
+@bp.route('/shows/create', methods=['POST'])
 def create_show_submission():
   # called to create new shows in the db, upon submitting new show listing form
   # insert form data as a new Show record in the db, instead
+  from scheduling import is_double_booking
   try:
     artist_id1 = request.form['artist_id']
     venue_id1= request.form['venue_id']
-    start_time1 = request.form['start_time']  
-    show = Show(artist_id =artist_id1, venue_id= venue_id1, start_time = start_time1)
+    start_time1 = datetime.fromisoformat(request.form['start_time'].strip())
+    end_time1 = request.form.get('end_time', '').strip()
+    end_time1 = datetime.fromisoformat(end_time1) if end_time1 else start_time1 + DEFAULT_SHOW_LENGTH
+    show = Show(artist_id =artist_id1, venue_id= venue_id1, start_time = start_time1, end_time = end_time1)
     db.session.add(show)
     db.session.commit()
     # on successful db insert, flash success
     flash('Show was successfully listed!') 
+  except IntegrityError as error:
+    db.session.rollback()
+    if is_double_booking(error):
+      flash('The venue already has a show at that time. Show could not be listed.')
+    else:
+      flash('An error occurred. Show could not be listed.')
   except:
     db.session.rollback()  
     flash('An error occurred. Show could not be listed.')
@@ -507,16 +514,163 @@ def create_show_submission():
   # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
   return render_template('pages/home.html')
 
-@app.errorhandler(404)
+@bp.route('/shows/schedule', methods=['GET'])
+def schedule_shows_form():
+  from forms import ShowBatchForm
+  form = ShowBatchForm()
+  return render_template('forms/schedule_shows.html', form=form)
+
+@bp.route('/shows/schedule', methods=['POST'])
+def schedule_shows_submission():
+  # Books every date of a residency at once; dates the venue already has a
+  # show on are reported rather than failing the batch.
+  from forms import ShowBatchForm
+  from scheduling import SchedulingError, is_double_booking, schedule_shows
+
+  form = ShowBatchForm(request.form, meta={'csrf': False},
+                       limit=current_app.config['SHOW_BATCH_LIMIT'])
+  if not form.validate():
+    message = []
+    for field, err in form.errors.items():
+      message.append(field + ' ' + err[0])
+    flash('Errors ' + str(message))
+    return render_template('forms/schedule_shows.html', form=form), 400
+
+  try:
+    created, conflicts = schedule_shows(db.session.connection(), form.artist_id.data,
+                                        form.venue_id.data, form.start_times,
+                                        timedelta(minutes=form.duration.data))
+    db.session.commit()
+  except SchedulingError as error:
+    db.session.rollback()
+    flash(str(error))
+    return render_template('forms/schedule_shows.html', form=form), 400
+  except IntegrityError as error:
+    # A show listed on its own got in between the conflict check and the
+    # insert.
+    db.session.rollback()
+    if not is_double_booking(error):
+      raise
+    flash('Another show was just listed at this venue; nothing was scheduled. Please try again.')
+    return render_template('forms/schedule_shows.html', form=form), 409
+  except:
+    db.session.rollback()
+    flash('An error occurred. Shows could not be scheduled.')
+    return render_template('forms/schedule_shows.html', form=form), 500
+  finally:
+    db.session.close()
+
+  flash('{} shows were successfully listed.'.format(len(created)))
+  if conflicts:
+    flash('{} dates were skipped: they overlap another show at the venue.'.format(len(conflicts)))
+  return render_template('forms/schedule_shows.html', form=form,
+                         created=created, conflicts=conflicts)
+
+#  API
+#  ----------------------------------------------------------------
+
+@bp.route('/api/venues')
+def api_browse_venues():
+  return browse_json(Venue)
+
+@bp.route('/api/artists')
+def api_browse_artists():
+  return browse_json(Artist)
+
+@bp.route('/api/venues/<int:venue_id>')
+def api_venue(venue_id):
+  return conditional_json(venue_version(venue_id), lambda: venue_detail(venue_id))
+
+@bp.route('/api/venues/<int:venue_id>/availability')
+def api_venue_availability(venue_id):
+  # ?from=2021-06-01&to=2021-06-08 (dates or datetimes, `to` exclusive) and
+  # optionally min_minutes, the shortest gap worth reporting.
+  try:
+    start = request.args.get('from')
+    start = datetime.fromisoformat(start) if start else datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    end = request.args.get('to')
+    end = datetime.fromisoformat(end) if end else start + timedelta(days=7)
+    min_length = timedelta(minutes=request.args.get('min_minutes', 0, type=int))
+  except ValueError:
+    return json_response({"error": "from and to must be ISO dates"}, 400)
+  # Shows are stored as naive UTC; a from/to with an offset is converted.
+  start, end = [value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+                for value in (start, end)]
+  if end <= start or end - start > timedelta(days=current_app.config['AVAILABILITY_MAX_DAYS']):
+    return json_response({"error": "to must be after from, and at most {} days later".format(
+      current_app.config['AVAILABILITY_MAX_DAYS'])}, 400)
+
+  data = venue_availability(venue_id, start, end, min_length)
+  if data is None:
+    return json_response({"error": "not found"}, 404)
+  return json_response(data)
+
+@bp.route('/api/artists/<int:artist_id>')
+def api_artist(artist_id):
+  return conditional_json(artist_version(artist_id), lambda: artist_detail(artist_id))
+
+@bp.route('/api/shows/<int:show_id>')
+def api_show(show_id):
+  return conditional_json(show_version(show_id), lambda: show_detail(show_id))
+
+#  Monitoring
+#  ----------------------------------------------------------------
+
+@bp.route('/cache/stats')
+def cache_stats():
+  return jsonify(dict(page_cache.stats(), fragments=fragment_cache.stats()))
+
+@bp.route('/db/stats')
+def db_stats():
+  stats = pool_stats.snapshot()
+  pool = db.engine.pool
+  stats.update({
+    "pool_size": pool.size(),
+    "checked_out": pool.checkedout(),
+    "overflow": pool.overflow()
+  })
+  replicas = current_app.extensions.get('replicas')
+  if replicas is not None:
+    stats["replicas"] = replicas.status()
+  return jsonify(stats)
+
+@bp.app_errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
+#----------------------------------------------------------------------------#
+# App factory.
+#----------------------------------------------------------------------------#
+
+def create_app(config=None):
+  # gunicorn imports this via wsgi.py, the `flask` command via manage.py.
+  # Building the app opens no connections, so it is safe to preload before
+  # forking workers; the engine is created on first use.
+  app = Flask(__name__)
+  app.config.from_object('config')
+  if config:
+    app.config.update(config)
+  configure_engine(app)
+
+  moment.init_app(app)
+  db.init_app(app)
+  page_cache.init_app(app)
+  fragment_cache.init_app(app)
+  sql_instrumentation.init_app(app)
+  metrics.init_app(app, db, page_cache, pool_stats, fragment_cache)
+  # After metrics, so its after_request runs first and is timed with the rest.
+  compress.init_app(app)
+  formatting.init_app(app)
+  templating.init_app(app)
+  assets.init_app(app)
+  app.register_blueprint(bp)
+
+  if not app.debug:
     file_handler = FileHandler('error.log')
     file_handler.setFormatter(
         Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
@@ -525,18 +679,13 @@ if not app.debug:
     file_handler.setLevel(logging.INFO)
     app.logger.addHandler(file_handler)
     app.logger.info('errors')
+  return app
 
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
 
-# Default port:
-if __name__ == '__main__':
-    app.run()
-
-# Or specify port manually:
-'''
+# Development server only; production runs gunicorn with gunicorn.conf.py.
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
-'''
+    create_app().run(port=port)
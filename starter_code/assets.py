@@ -0,0 +1,173 @@
+#----------------------------------------------------------------------------#
+# Static asset bundles.
+#----------------------------------------------------------------------------#
+
+# `flask build-assets` concatenates and minifies each bundle into
+# static/dist/, names the output after a hash of its content and writes
+# .gz and .br variants next to it:
+#
+#   static/dist/main.3f9a1c0b7e42.css  (.css.gz, .css.br)
+#   static/dist/manifest.json          {"main.css": "main.3f9a1c0b7e42.css", ...}
+#
+# A changed file gets a new name, so /static/dist/ is served as immutable
+# with a one year max-age, and the variant the client accepts (br, then
+# gzip) is picked per request. Without a manifest, or in debug mode, the
+# layout links the source files instead.
+#
+# The minifiers and brotli are only needed to build, not to serve.
+
+import gzip
+import hashlib
+import json
+import os
+
+from flask import current_app, request, send_from_directory, url_for
+from werkzeug.exceptions import NotFound
+
+# bundle -> source files under static/, in load order
+BUNDLES = {
+    'main.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    # Loaded in <head>, before the page renders.
+    'head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+    ],
+    # Deferred, after jQuery.
+    'site.js': [
+        'js/script.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+    ],
+}
+
+MIMETYPES = {'.css': 'text/css', '.js': 'application/javascript'}
+
+# (Content-Encoding, file suffix), in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+DIST = 'dist'
+
+
+def init_app(app):
+    app.config.setdefault('ASSETS_MAX_AGE', 365 * 24 * 3600)
+    app.config.setdefault('ASSETS_BUNDLED', not app.debug)
+    app.extensions['assets'] = _load_manifest(app) if app.config['ASSETS_BUNDLED'] else {}
+    # More specific than Flask's /static/<path:filename>, so it wins the match.
+    app.add_url_rule(app.static_url_path + '/' + DIST + '/<path:filename>',
+                     'assets', serve)
+    app.add_template_global(asset_urls)
+
+
+def _dist_folder(app):
+    return os.path.join(app.static_folder, DIST)
+
+
+def _manifest_path(app):
+    return os.path.join(_dist_folder(app), 'manifest.json')
+
+
+def _load_manifest(app):
+    try:
+        with open(_manifest_path(app)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        app.logger.warning('No asset manifest; run `flask build-assets`. Serving source files.')
+        return {}
+
+
+def asset_urls(bundle):
+    manifest = current_app.extensions['assets']
+    if bundle in manifest:
+        return [url_for('assets', filename=manifest[bundle])]
+    return [url_for('static', filename=path) for path in BUNDLES[bundle]]
+
+
+def serve(filename):
+    extension = os.path.splitext(filename)[1]
+    if extension not in MIMETYPES:
+        raise NotFound()
+    folder = _dist_folder(current_app)
+    accepted = request.accept_encodings
+    for encoding, suffix in ENCODINGS:
+        if accepted[encoding] and os.path.isfile(os.path.join(folder, filename + suffix)):
+            response = send_from_directory(folder, filename + suffix,
+                                           mimetype=MIMETYPES[extension])
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(folder, filename, mimetype=MIMETYPES[extension])
+    response.vary.add('Accept-Encoding')
+    # Replaces whatever send_from_directory set for ordinary static files.
+    response.headers['Cache-Control'] = 'public, max-age={}, immutable'.format(
+        current_app.config['ASSETS_MAX_AGE'])
+    return response
+
+
+#  Build
+#  ----------------------------------------------------------------
+
+def _read(app, path):
+    with open(os.path.join(app.static_folder, path), encoding='utf-8') as f:
+        return f.read()
+
+
+def _bundle(app, name):
+    import rcssmin
+    import rjsmin
+
+    parts = []
+    for path in BUNDLES[name]:
+        source = _read(app, path)
+        # Vendor files ship minified; only ours go through the minifier.
+        if '.min.' not in path:
+            if name.endswith('.css'):
+                source = rcssmin.cssmin(source, keep_bang_comments=True)
+            else:
+                source = rjsmin.jsmin(source, keep_bang_comments=True)
+        # The maps aren't published, and wouldn't match the bundle anyway.
+        lines = [line for line in source.splitlines()
+                 if not line.startswith(('//# sourceMappingURL=', '/*# sourceMappingURL='))]
+        parts.append('\n'.join(lines).strip())
+    # `;` guards against a file that ends without one.
+    separator = '\n' if name.endswith('.css') else '\n;\n'
+    return (separator.join(parts) + '\n').encode('utf-8')
+
+
+def _write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def build(app):
+    # Returns the new manifest. Outputs of earlier builds are removed once
+    # the new ones are written.
+    import brotli
+
+    folder = _dist_folder(app)
+    os.makedirs(folder, exist_ok=True)
+    manifest = {}
+    written = {'manifest.json'}
+    for name in BUNDLES:
+        data = _bundle(app, name)
+        stem, extension = os.path.splitext(name)
+        filename = '{}.{}{}'.format(stem, hashlib.sha256(data).hexdigest()[:12], extension)
+        _write(os.path.join(folder, filename), data)
+        # mtime=0 keeps the .gz byte-identical across builds.
+        _write(os.path.join(folder, filename + '.gz'), gzip.compress(data, 9, mtime=0))
+        _write(os.path.join(folder, filename + '.br'),
+               brotli.compress(data, mode=brotli.MODE_TEXT, quality=11))
+        manifest[name] = filename
+        written.update((filename, filename + '.gz', filename + '.br'))
+
+    with open(_manifest_path(app), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    for stale in set(os.listdir(folder)) - written:
+        os.remove(os.path.join(folder, stale))
+    app.extensions['assets'] = manifest
+    return manifest
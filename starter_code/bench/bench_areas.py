@@ -0,0 +1,46 @@
+#----------------------------------------------------------------------------#
+# /venues area directory: query count and latency as the number of areas grows.
+#
+#   BENCH_DATABASE_URL=postgresql://localhost/fyyur_bench python bench/bench_areas.py
+#----------------------------------------------------------------------------#
+
+from common import bench_app, count_queries, timed, truncate
+
+from models import db, Venue
+from queries import venue_areas
+
+SCALES = [10, 100, 1000, 10000, 50000]
+VENUES_PER_AREA = 3
+
+
+def seed(areas):
+    truncate('Show', 'Venue')
+    rows = []
+    for area in range(areas):
+        for n in range(VENUES_PER_AREA):
+            rows.append({
+                "name": "Venue {}-{}".format(area, n),
+                "city": "City {}".format(area),
+                "state": "ST",
+                "seeking_talent": False
+            })
+    db.session.execute(Venue.__table__.insert(), rows)
+    db.session.commit()
+
+
+def main():
+    app = bench_app()
+    with app.app_context():
+        print('{:>8} {:>8} {:>10}'.format('areas', 'queries', 'seconds'))
+        for areas in SCALES:
+            seed(areas)
+            results = {}
+            with count_queries() as counter, timed(results, 'venue_areas'):
+                data = venue_areas()
+            assert len(data) == areas
+            print('{:>8} {:>8} {:>10.4f}'.format(areas, counter.count, results['venue_areas']))
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#----------------------------------------------------------------------------#
+# Venue availability and double-booking checks over venues with thousands of
+# shows each: latency and the index the overlap lookups use.
+#
+#   BENCH_DATABASE_URL=postgresql://localhost/fyyur_bench python bench/bench_availability.py [shows per venue]
+#
+# Run `flask db upgrade` against the benchmark database first; the lookups
+# rely on the GiST index behind ex_Show_venue_slot.
+#----------------------------------------------------------------------------#
+
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from common import bench_app, explain, plan_nodes, timed, truncate
+
+from counters import recount
+from models import db, Show
+from queries import venue_availability, venue_busy_query
+
+VENUES = 100
+FIRST = datetime(2030, 1, 1, 20, 0)
+WINDOWS = [timedelta(days=1), timedelta(days=7), timedelta(days=31), timedelta(days=92)]
+REPEAT = 50
+
+
+def seed(per_venue):
+    truncate('Show', 'Venue', 'Artist')
+    db.session.execute(
+        'INSERT INTO "Venue" (name, city, state) '
+        'SELECT \'Venue \' || n, \'San Francisco\', \'CA\' FROM generate_series(1, :venues) AS n',
+        {'venues': VENUES})
+    db.session.execute('INSERT INTO "Artist" (name, city, state) VALUES (\'House Band\', \'SF\', \'CA\')')
+    # A three-hour show every night at every venue.
+    db.session.execute(
+        'INSERT INTO "Show" (artist_id, venue_id, start_time, end_time) '
+        'SELECT 1, v, :first + d * interval \'1 day\', :first + d * interval \'1 day\' + interval \'3 hours\' '
+        'FROM generate_series(1, :venues) AS v, generate_series(0, :days - 1) AS d',
+        {'venues': VENUES, 'days': per_venue, 'first': FIRST})
+    recount(db.session.connection())
+    db.session.commit()
+    db.session.execute('ANALYZE "Show"')
+    db.session.commit()
+
+
+def indexes(query):
+    plan = explain(query)
+    names = sorted(set(node['Index Name'] for node in plan_nodes(plan) if 'Index Name' in node))
+    return ', '.join(names) or 'SEQ SCAN'
+
+
+def double_booking(per_venue):
+    # What /shows/create costs when the slot is taken: the INSERT is refused
+    # by the exclusion constraint inside a savepoint.
+    refused = 0
+    for n in range(REPEAT):
+        start = FIRST + timedelta(days=n % per_venue, hours=1)
+        try:
+            with db.session.begin_nested():
+                db.session.add(Show(artist_id=1, venue_id=1 + n % VENUES,
+                                    start_time=start, end_time=start + timedelta(hours=1)))
+        except IntegrityError:
+            refused += 1
+    db.session.rollback()
+    return refused
+
+
+def main():
+    per_venue = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    app = bench_app()
+    with app.app_context():
+        seed(per_venue)
+        middle = FIRST + timedelta(days=per_venue // 2)
+        print('{:>8} {:>8} {:>12}  {}'.format('window', 'shows', 'ms', 'index scans'))
+        for window in WINDOWS:
+            results = {}
+            with timed(results, 'availability'):
+                for n in range(REPEAT):
+                    data = venue_availability(1 + n % VENUES, middle, middle + window)
+            print('{:>7}d {:>8} {:>12.3f}  {}'.format(
+                window.days, len(data['shows']), results['availability'] / REPEAT * 1000,
+                indexes(venue_busy_query(1, middle, middle + window))))
+
+        results = {}
+        with timed(results, 'refused'):
+            refused = double_booking(per_venue)
+        print('\n{} of {} double bookings refused, {:.3f}ms each'.format(
+            refused, REPEAT, results['refused'] / REPEAT * 1000))
+        db.session.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#----------------------------------------------------------------------------#
+# Genre browse over the load-test dataset: latency of a page of results plus
+# its facet counts for a few filter combinations, and the indexes they use.
+#
+#   BENCH_DATABASE_URL=postgresql://localhost/fyyur_bench python bench/bench_browse.py [--scale 10]
+#
+# Run `flask db upgrade` against the benchmark database first; the filters
+# rely on the ix_*_genres GIN indexes.
+#----------------------------------------------------------------------------#
+
+import argparse
+
+from common import bench_app, explain, plan_nodes, timed
+
+from loadtest import seed, GENRES, STATES
+from models import db, page_cache, Venue, Artist
+from queries import browse, browse_query, facet_counts, facet_counts_query, facet_summary
+
+REPEAT = 20
+
+FILTERS = [
+    ('genre', {'genre': GENRES[:1]}),
+    ('2 genres', {'genre': GENRES[:2]}),
+    ('genre+state', {'genre': GENRES[:1], 'state': STATES[0]}),
+    ('state+city', {'state': STATES[12], 'city': 'City 12'}),
+    ('genre+seeking', {'genre': GENRES[:1], 'seeking': True}),
+]
+
+
+def indexes(query):
+    plan = explain(query)
+    names = sorted(set(node['Index Name'] for node in plan_nodes(plan) if 'Index Name' in node))
+    return ', '.join(names) or 'SEQ SCAN'
+
+
+def per_call(fn, *args):
+    results = {}
+    with timed(results, 'call'):
+        for _ in range(REPEAT):
+            value = fn(*args)
+    return value, results['call'] / REPEAT * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale', type=int, default=10)
+    parser.add_argument('--no-seed', action='store_true', help='reuse the data already there')
+    args = parser.parse_args()
+
+    app = bench_app()
+    with app.app_context():
+        if not args.no_seed:
+            seed(args.scale)
+        limit = app.config['BROWSE_RESULTS_PER_PAGE']
+        print('{:<8} {:<14} {:>8} {:>10} {:>10}  {}'.format(
+            'entity', 'filter', 'matches', 'page ms', 'facets ms', 'index scans'))
+        for entity in (Venue, Artist):
+            for name, filters in FILTERS:
+                _, page = per_call(browse, entity, filters, limit)
+                facets, counting = per_call(facet_counts, entity, filters)
+                scans = sorted(set(indexes(browse_query(entity, filters, limit)).split(', ') +
+                                   indexes(facet_counts_query(entity, filters)).split(', ')))
+                print('{:<8} {:<14} {:>8} {:>10.3f} {:>10.3f}  {}'.format(
+                    entity.__tablename__, name, facets['total'], page, counting, ', '.join(scans)))
+
+            # The unfiltered summary: counted on a miss, then from the cache.
+            page_cache.backend.clear()
+            _, uncached = per_call(facet_counts, entity, {})
+            _, cached = per_call(facet_summary, entity, {'genre': [], 'state': None,
+                                                         'city': None, 'seeking': False})
+            print('{:<8} {:<14} {:>8} {:>10} {:>10.3f}  cached: {:.3f}ms\n'.format(
+                entity.__tablename__, 'none', '', '', uncached, cached))
+        db.session.rollback()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#----------------------------------------------------------------------------#
+# Bytes on the wire and CPU per request for compressed responses, on the
+# largest pages rendered with fixture data. Needs no database.
+#
+#   python bench/bench_compression.py [--rows 1] [--repeat 50]
+#
+# First, every page is compressed at each level to show the size/CPU
+# trade; then the whole request goes through the app, with the configured
+# levels, for identity, gzip and br clients. --rows scales the fixtures
+# (1 = a full page of shows and artists, 200 venues, 5000 streamed artists).
+#----------------------------------------------------------------------------#
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from flask import Response, render_template, stream_with_context
+
+import common
+from app import create_app, stream_template
+from compression import compress
+
+LEVELS = [('gzip', 1), ('gzip', 6), ('gzip', 9), ('br', 1), ('br', 4), ('br', 6), ('br', 11)]
+
+
+def fixtures(app, rows):
+    start = datetime(2021, 6, 1, 20, 0)
+    shows = [{"venue_id": n, "venue_name": "Venue {}".format(n), "artist_id": n,
+              "artist_name": "Artist {}".format(n),
+              "artist_image_link": "https://images.example.com/artists/{}.jpg".format(n),
+              "start_time": start + timedelta(hours=7 * n)}
+             for n in range(app.config['SHOWS_PER_PAGE'] * rows)]
+    artists = [{"id": n, "name": "Artist {}".format(n), "upcoming_shows_count": n % 13}
+               for n in range(app.config['ARTISTS_PER_PAGE'] * rows)]
+    areas = [{"city": "City {}".format(n), "state": "CA",
+              "venues": [{"id": n * 10 + v, "name": "Venue {}".format(n * 10 + v),
+                          "num_upcoming_shows": v} for v in range(10)]}
+             for n in range(20 * rows)]
+    everyone = [{"id": n, "name": "Artist {}".format(n), "upcoming_shows_count": n % 13}
+                for n in range(5000 * rows)]
+    return [
+        ('/shows', lambda: render_template('pages/shows.html', shows=shows,
+                                           next_cursor='abc', upcoming=False)),
+        ('/artists', lambda: render_template('pages/artists.html', artists=artists,
+                                             next_cursor=51)),
+        ('/venues', lambda: render_template('pages/venues.html', areas=areas)),
+        ('/artists?all=1', lambda: Response(stream_with_context(
+            stream_template('pages/artists.html', artists=iter(everyone))))),
+    ]
+
+
+def cpu_per_call(fn, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - start) / repeat * 1000
+
+
+def levels(app, pages, repeat):
+    print('{:<16} {:>10}'.format('page', 'identity') +
+          ''.join('{:>16}'.format('{} {}'.format(*level)) for level in LEVELS))
+    with app.test_request_context('/'):
+        for path, view in pages:
+            if path.endswith('all=1'):
+                continue
+            body = view().encode('utf-8')
+            cells = []
+            for encoding, level in LEVELS:
+                size = len(compress(body, encoding, level))
+                ms = cpu_per_call(lambda: compress(body, encoding, level), repeat)
+                cells.append('{:>7} {:>5.2f}ms'.format(size, ms))
+            print('{:<16} {:>10}'.format(path, len(body)) +
+                  ''.join('{:>16}'.format(cell) for cell in cells))
+
+
+def requests(app, pages, repeat):
+    # Each page's view is mounted on its own rule so the request goes
+    # through every after_request hook, compression included.
+    for n, (path, view) in enumerate(pages):
+        app.add_url_rule('/_bench/{}'.format(n), 'bench_{}'.format(n), view)
+    client = app.test_client()
+    print('\n{:<16} {:>10} {:>12} {:>12}'.format('page', 'encoding', 'bytes', 'cpu/request'))
+    for n, (path, _) in enumerate(pages):
+        for accept in ('identity', 'gzip', 'br'):
+            def get():
+                response = client.get('/_bench/{}'.format(n), headers={'Accept-Encoding': accept})
+                response.get_data()  # drains a streamed body
+                return response
+            response = get()
+            assert response.status_code == 200, response.status_code
+            print('{:<16} {:>10} {:>12} {:>10.2f}ms'.format(
+                path, response.headers.get('Content-Encoding', 'identity'),
+                len(response.data), cpu_per_call(get, repeat)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app({'SQL_DEBUG_ENDPOINT': False})
+    pages = fixtures(app, args.rows)
+    levels(app, pages, args.repeat)
+    requests(app, pages, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#----------------------------------------------------------------------------#
+# Jinja `datetime` filter: the original str -> parse -> babel path versus
+# formatting.format_datetime on native datetimes. Needs no database.
+#
+#   python bench/bench_datetime.py [shows]
+#----------------------------------------------------------------------------#
+
+import sys
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+import common
+from app import create_app
+import formatting
+
+
+def legacy_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def run(label, fn, values):
+    start = time.perf_counter()
+    output = [fn(value, 'full') for value in values]
+    elapsed = time.perf_counter() - start
+    print('{:>10} {:>10.4f}s {:>10.1f}us/show'.format(label, elapsed, elapsed / len(values) * 1e6))
+    return output
+
+
+def main():
+    shows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    first = datetime(2021, 1, 1, 20, 0)
+    values = [first + timedelta(hours=7 * n) for n in range(shows)]
+
+    app = create_app()
+    with app.test_request_context('/shows'):
+        app.preprocess_request()
+        legacy = run('legacy', legacy_format_datetime, [str(value) for value in values])
+        formatting.compiled_pattern.cache_clear()
+        current = run('native', formatting.format_datetime, values)
+    assert legacy == current, 'formatters disagree'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#----------------------------------------------------------------------------#
+# Render time of the list pages with the fragment cache off, cold and warm.
+# Fixture data; needs no database.
+#
+#   python bench/bench_fragments.py [--rows 1] [--repeat 200]
+#
+# "off" renders every tile, "cold" renders them and fills the cache (the
+# first request after a deploy or an edit), "warm" assembles the page from
+# cached fragments.
+#----------------------------------------------------------------------------#
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from flask import render_template
+
+import common
+from app import create_app
+from models import fragment_cache
+
+
+def fixtures(app, rows):
+    start = datetime(2021, 6, 1, 20, 0)
+    updated = datetime(2021, 5, 1, 12, 0)
+    shows = [{"id": n, "version": updated, "venue_id": n, "venue_name": "Venue {}".format(n),
+              "artist_id": n, "artist_name": "Artist {}".format(n),
+              "artist_image_link": "https://images.example.com/artists/{}.jpg".format(n),
+              "start_time": start + timedelta(hours=7 * n)}
+             for n in range(app.config['SHOWS_PER_PAGE'] * rows)]
+    artists = [{"id": n, "name": "Artist {}".format(n), "updated_at": updated,
+                "upcoming_shows_count": n % 13}
+               for n in range(app.config['ARTISTS_PER_PAGE'] * rows)]
+    return [
+        ('/shows', 'pages/shows.html', {"shows": shows, "next_cursor": 'abc', "upcoming": False}),
+        ('/artists', 'pages/artists.html', {"artists": artists, "next_cursor": 51}),
+    ]
+
+
+def per_render(name, context, repeat, before=None):
+    elapsed = 0.0
+    for _ in range(repeat):
+        if before:
+            before()
+        start = time.perf_counter()
+        render_template(name, **context)
+        elapsed += time.perf_counter() - start
+    return elapsed / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    app = create_app({'SQL_DEBUG_ENDPOINT': False})
+    print('{:<10} {:>6} {:>10} {:>10} {:>10} {:>8}'.format(
+        'page', 'tiles', 'off', 'cold', 'warm', 'speedup'))
+    with app.test_request_context('/'):
+        for path, name, context in fixtures(app, args.rows):
+            tiles = len(next(iter(context.values())))
+            app.jinja_env.fragment_cache = None
+            off = per_render(name, context, args.repeat)
+            app.jinja_env.fragment_cache = fragment_cache
+            cold = per_render(name, context, args.repeat, fragment_cache.backend.clear)
+            warm = per_render(name, context, args.repeat)
+            print('{:<10} {:>6} {:>8.3f}ms {:>8.3f}ms {:>8.3f}ms {:>7.1f}x'.format(
+                path, tiles, off, cold, warm, off / warm))
+    print('\n{}'.format(fragment_cache.stats()))
+
+
+if __name__ == '__main__':
+    main()
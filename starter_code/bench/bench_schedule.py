@@ -0,0 +1,61 @@
+#----------------------------------------------------------------------------#
+# Scheduling a residency: one show per request, as /shows/create does, versus
+# scheduling.schedule_shows in a single statement.
+#
+#   BENCH_DATABASE_URL=postgresql://localhost/fyyur_bench python bench/bench_schedule.py
+#----------------------------------------------------------------------------#
+
+from datetime import datetime, timedelta
+
+from common import bench_app, count_queries, timed, truncate
+
+from models import db, Venue, Artist, Show
+from scheduling import schedule_shows
+
+SIZES = [10, 50, 200, 500]
+
+
+def seed():
+    truncate('Show', 'Venue', 'Artist')
+    db.session.add(Venue(id=1, name='The Residency', city='San Francisco', state='CA'))
+    db.session.add(Artist(id=1, name='House Band', city='San Francisco', state='CA'))
+    db.session.commit()
+
+
+def dates(count, offset):
+    first = datetime(2030, 1, 4, 12, 0) + timedelta(hours=offset)
+    return [first + timedelta(weeks=n) for n in range(count)]
+
+
+def one_at_a_time(start_times):
+    for start_time in start_times:
+        db.session.add(Show(artist_id=1, venue_id=1, start_time=start_time))
+        db.session.commit()
+
+
+def batch(start_times):
+    created, conflicts = schedule_shows(db.session.connection(), 1, 1, start_times)
+    db.session.commit()
+    assert not conflicts
+
+
+def main():
+    app = bench_app()
+    with app.app_context():
+        seed()
+        print('{:>6} {:>22} {:>22} {:>8}'.format('shows', 'one at a time', 'batch', 'speedup'))
+        for offset, size in enumerate(SIZES):
+            results = {}
+            # A different hour per run, so no run conflicts with an earlier one.
+            with count_queries() as single, timed(results, 'single'):
+                one_at_a_time(dates(size, 2 * offset))
+            with count_queries() as batched, timed(results, 'batch'):
+                batch(dates(size, 2 * offset + 1))
+            print('{:>6} {:>9.0f}/s {:>5} stmts {:>9.0f}/s {:>5} stmts {:>7.1f}x'.format(
+                size, size / results['single'], single.count,
+                size / results['batch'], batched.count, results['single'] / results['batch']))
+        db.session.close()
+
+
+if __name__ == '__main__':
+    main()
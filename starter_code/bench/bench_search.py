@@ -0,0 +1,55 @@
+#----------------------------------------------------------------------------#
+# Venue/artist search over a large seeded table: index usage and latency.
+#
+#   BENCH_DATABASE_URL=postgresql://localhost/fyyur_bench python bench/bench_search.py [rows]
+#----------------------------------------------------------------------------#
+
+import sys
+
+from common import bench_app, explain, plan_nodes, timed, truncate
+
+from models import db, Venue, Artist
+from queries import search, search_query
+
+TERMS = ['hop', 'music', 'band', 'San Francisco', 'zzzz']
+
+
+def seed(rows):
+    truncate('Show', 'Venue', 'Artist')
+    for table, extra in (('Venue', ', address'), ('Artist', '')):
+        db.session.execute(
+            'INSERT INTO "{table}" (name, city, state{extra}, seeking_{flag}) '
+            'SELECT md5(n::text) || CASE WHEN n % 1000 = 0 THEN \' Music Hop\' ELSE \'\' END, '
+            '\'City \' || (n % 5000), \'CA\'{extra_value}, false '
+            'FROM generate_series(1, :rows) AS n'.format(
+                table=table, extra=extra,
+                extra_value=", n || ' Main St'" if extra else '',
+                flag='talent' if table == 'Venue' else 'venue'),
+            {'rows': rows})
+    db.session.commit()
+    db.session.execute('ANALYZE "Venue"')
+    db.session.execute('ANALYZE "Artist"')
+    db.session.commit()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    app = bench_app()
+    with app.app_context():
+        seed(rows)
+        print('{:>8} {:>16} {:>8} {:>10}  {}'.format('entity', 'term', 'total', 'seconds', 'index scans'))
+        for entity in (Venue, Artist):
+            for term in TERMS:
+                results = {}
+                with timed(results, 'search'):
+                    response = search(entity, term, 1, 20)
+                plan = explain(search_query(entity, term, 1, 20))
+                indexes = sorted(set(node['Index Name'] for node in plan_nodes(plan)
+                                     if 'Index Name' in node))
+                print('{:>8} {:>16} {:>8} {:>10.4f}  {}'.format(
+                    entity.__tablename__, term, response['count'], results['search'],
+                    ', '.join(indexes) or 'SEQ SCAN'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#----------------------------------------------------------------------------#
+# Time to first request for a fresh process, with a regression threshold.
+#
+#   python bench/bench_startup.py [--runs 5] [--budget-ms 750]
+#
+# Each run starts a new interpreter that imports wsgi (as a gunicorn worker
+# or a dyno would), then serves GET /venues/create through the test client:
+# a real page with a form and the layout, but no database round trip.
+# Exits 1 if the median exceeds the budget (STARTUP_BUDGET_MS).
+#----------------------------------------------------------------------------#
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import json, time
+start = time.perf_counter()
+import wsgi
+imported = time.perf_counter()
+response = wsgi.app.test_client().get('/venues/create')
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({"import_ms": (imported - start) * 1000,
+                  "first_request_ms": (served - imported) * 1000,
+                  "total_ms": (served - start) * 1000}))
+'''
+
+
+def probe():
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, check=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float,
+                        default=float(os.environ.get('STARTUP_BUDGET_MS', 750)))
+    args = parser.parse_args()
+
+    probe()  # warm the OS file cache and .pyc files
+    runs = [probe() for _ in range(args.runs)]
+    print('{:>18} {:>10} {:>10} {:>10}'.format('', 'median', 'min', 'max'))
+    for key in ('import_ms', 'first_request_ms', 'total_ms'):
+        values = [run[key] for run in runs]
+        print('{:>18} {:>10.1f} {:>10.1f} {:>10.1f}'.format(
+            key, statistics.median(values), min(values), max(values)))
+
+    median = statistics.median(run['total_ms'] for run in runs)
+    if median > args.budget_ms:
+        print('FAIL: time to first request {:.0f}ms is over the {:.0f}ms budget'.format(
+            median, args.budget_ms), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
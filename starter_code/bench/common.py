@@ -0,0 +1,77 @@
+#----------------------------------------------------------------------------#
+# Benchmark helpers.
+#----------------------------------------------------------------------------#
+
+# Benchmarks seed and truncate tables, so they only run against the database
+# named by BENCH_DATABASE_URL, never the one configured in config.py.
+
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+
+from app import create_app
+from models import db
+
+
+def bench_app():
+    url = os.environ.get('BENCH_DATABASE_URL')
+    if not url:
+        sys.exit('Set BENCH_DATABASE_URL to a scratch database.')
+    return create_app({'SQLALCHEMY_DATABASE_URI': url})
+
+
+def truncate(*tables):
+    names = ', '.join('"{}"'.format(table) for table in tables)
+    db.session.execute('TRUNCATE {} RESTART IDENTITY CASCADE'.format(names))
+    db.session.commit()
+
+
+def explain(query, analyze=True):
+    # EXPLAIN an ORM query with its bound parameters; returns the JSON plan.
+    compiled = query.statement.compile(dialect=postgresql.dialect())
+    options = 'ANALYZE, BUFFERS, FORMAT JSON' if analyze else 'FORMAT JSON'
+    result = db.session.connection().exec_driver_sql(
+        'EXPLAIN ({}) {}'.format(options, compiled), compiled.params)
+    return result.scalar()[0]
+
+
+def plan_nodes(plan):
+    node = plan['Plan'] if 'Plan' in plan else plan
+    yield node
+    for child in node.get('Plans', []):
+        for descendant in plan_nodes(child):
+            yield descendant
+
+
+class QueryCounter(object):
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries():
+    counter = QueryCounter()
+    event.listen(db.engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', counter)
+
+
+@contextmanager
+def timed(results, name):
+    start = time.perf_counter()
+    yield
+    results[name] = time.perf_counter() - start
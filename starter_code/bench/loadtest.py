@@ -0,0 +1,314 @@
+#----------------------------------------------------------------------------#
+# Load test: seed a realistic dataset, then drive a running server.
+#
+#   BENCH_DATABASE_URL=postgresql://localhost/fyyur_bench python bench/loadtest.py seed --scale 10
+#   BENCH_DATABASE_URL=postgresql://localhost/fyyur_bench python bench/loadtest.py run \
+#       --url http://127.0.0.1:5000 --concurrency 16 --duration 60 --output before.json
+#   python bench/loadtest.py compare before.json after.json
+#
+# The server under test must be started against the same BENCH_DATABASE_URL
+# (DATABASE_URL=$BENCH_DATABASE_URL). `run` reads the seeded id ranges from
+# it so detail pages hit real rows.
+#----------------------------------------------------------------------------#
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from common import bench_app, truncate
+
+from counters import recount
+from models import db, Venue, Artist
+from forms import VenueForm
+
+GENRES = [value for value, _ in VenueForm.genres.kwargs['choices']]
+STATES = [value for value, _ in VenueForm.state.kwargs['choices']]
+SEARCH_TERMS = ['hop', 'music', 'band', 'jazz', 'San Francisco', 'zzzz']
+
+# Per unit of --scale.
+VENUES = 1000
+ARTISTS = 2000
+SHOWS = 20000
+CITIES = 500
+
+
+#  Seeding
+#  ----------------------------------------------------------------
+
+def seed(scale):
+    truncate('Show', 'Venue', 'Artist')
+    params = {
+        'venues': VENUES * scale,
+        'artists': ARTISTS * scale,
+        'shows': SHOWS * scale,
+        'cities': CITIES,
+        'genres': GENRES,
+        'states': STATES
+    }
+    # Names mix a few real words in so that searches have something to find;
+    # each row gets one to three genres and an area drawn from a fixed pool.
+    db.session.execute(
+        'INSERT INTO "Venue" (name, city, state, address, phone, genres, image_link, '
+        'facebook_link, website, seeking_talent, seeking_description) '
+        'SELECT (ARRAY[\'The\', \'Hop\', \'Music\', \'Jazz\'])[1 + n % 4] || \' Hall \' || n, '
+        '\'City \' || (n % :cities), (:states)[1 + n % cardinality(:states)], '
+        'n || \' Main St\', \'5550000000\', '
+        'ARRAY[(:genres)[1 + n % cardinality(:genres)], (:genres)[1 + (n / 7) % cardinality(:genres)]]'
+        '::varchar[], '
+        '\'https://example.com/v/\' || n || \'.jpg\', \'https://facebook.com/v\' || n, '
+        '\'https://example.com/v/\' || n, n % 3 = 0, '
+        'CASE WHEN n % 3 = 0 THEN \'Looking for local bands\' END '
+        'FROM generate_series(1, :venues) AS n', params)
+    db.session.execute(
+        'INSERT INTO "Artist" (name, city, state, phone, genres, image_link, '
+        'facebook_link, website, seeking_venue, seeking_description) '
+        'SELECT (ARRAY[\'The\', \'Band\', \'Music\', \'Hop\', \'Jazz\'])[1 + n % 5] || \' Collective \' || n, '
+        '\'City \' || (n % :cities), (:states)[1 + n % cardinality(:states)], '
+        '\'5550000000\', '
+        '(ARRAY[(:genres)[1 + n % cardinality(:genres)], (:genres)[1 + (n / 3) % cardinality(:genres)], '
+        '(:genres)[1 + (n / 11) % cardinality(:genres)]])[1:1 + n % 3]::varchar[], '
+        '\'https://example.com/a/\' || n || \'.jpg\', \'https://facebook.com/a\' || n, '
+        '\'https://example.com/a/\' || n, n % 4 = 0, '
+        'CASE WHEN n % 4 = 0 THEN \'Looking for a residency\' END '
+        'FROM generate_series(1, :artists) AS n', params)
+    # Start times spread over a year either side of now, so roughly half the
+    # shows are upcoming whenever the test runs. Each venue's two years are
+    # cut into one slot per show and every show starts somewhere in the first
+    # 80% of its slot, so no two overlap (ex_Show_venue_slot).
+    db.session.execute(
+        'INSERT INTO "Show" (artist_id, venue_id, start_time, end_time) '
+        'SELECT artist_id, venue_id, start_time, start_time + interval \'3 hours\' FROM ('
+        '  SELECT 1 + floor(random() * :artists)::int AS artist_id, 1 + n % :venues AS venue_id, '
+        '  date_trunc(\'hour\', (now() at time zone \'utc\') - interval \'365 days\' '
+        '    + ((n / :venues) + random() * 0.8) * (730.0 * :venues / :shows) * interval \'1 day\') AS start_time '
+        '  FROM generate_series(0, :shows - 1) AS n'
+        ') AS shows', params)
+    recount(db.session.connection())
+    db.session.commit()
+    for table in ('Venue', 'Artist', 'Show'):
+        db.session.execute('ANALYZE "{}"'.format(table))
+    db.session.commit()
+    return params
+
+
+#  Traffic
+#  ----------------------------------------------------------------
+
+def _form(fields):
+    return urlencode(fields, doseq=True).encode()
+
+
+def venue_form(rng):
+    n = rng.randrange(10 ** 9)
+    return _form({
+        'name': 'Loadtest Venue {}'.format(n), 'city': 'City {}'.format(n % CITIES),
+        'state': rng.choice(STATES), 'address': '{} Main St'.format(n),
+        'phone': '5550000000', 'genres': rng.sample(GENRES, 2),
+        'facebook_link': 'https://facebook.com/lt{}'.format(n), 'image_link': '',
+        'website_link': '', 'seeking_description': ''
+    })
+
+
+def artist_form(rng):
+    n = rng.randrange(10 ** 9)
+    return _form({
+        'name': 'Loadtest Artist {}'.format(n), 'city': 'City {}'.format(n % CITIES),
+        'state': rng.choice(STATES), 'phone': '5550000000', 'genres': rng.sample(GENRES, 2),
+        'facebook_link': 'https://facebook.com/lt{}'.format(n), 'image_link': '',
+        'website_link': '', 'seeking_description': ''
+    })
+
+
+def routes(max_venue, max_artist, writes):
+    # (name, weight, build) where build(rng) returns (path, body or None).
+    mix = [
+        ('GET /', 5, lambda rng: ('/', None)),
+        ('GET /venues', 10, lambda rng: ('/venues', None)),
+        ('GET /artists', 10, lambda rng: ('/artists', None)),
+        ('GET /artists?sort=upcoming', 5, lambda rng: ('/artists?sort=upcoming', None)),
+        ('GET /shows', 10, lambda rng: ('/shows', None)),
+        ('GET /shows?upcoming=1', 5, lambda rng: ('/shows?upcoming=1', None)),
+        ('GET /venues/<id>', 20, lambda rng: ('/venues/{}'.format(rng.randint(1, max_venue)), None)),
+        ('GET /artists/<id>', 20, lambda rng: ('/artists/{}'.format(rng.randint(1, max_artist)), None)),
+        ('POST /venues/search', 8,
+         lambda rng: ('/venues/search', _form({'search_term': rng.choice(SEARCH_TERMS)}))),
+        ('POST /artists/search', 8,
+         lambda rng: ('/artists/search', _form({'search_term': rng.choice(SEARCH_TERMS)}))),
+        ('GET /venues/create', 2, lambda rng: ('/venues/create', None)),
+        ('GET /artists/create', 2, lambda rng: ('/artists/create', None)),
+    ]
+    if writes:
+        mix += [
+            ('POST /venues/create', 1, lambda rng: ('/venues/create', venue_form(rng))),
+            ('POST /artists/create', 1, lambda rng: ('/artists/create', artist_form(rng))),
+        ]
+    return mix
+
+
+def worker(base_url, mix, deadline, seed, timeout, results, lock):
+    rng = random.Random(seed)
+    names = [name for name, _, _ in mix]
+    weights = [weight for _, weight, _ in mix]
+    builders = dict((name, build) for name, _, build in mix)
+    local = defaultdict(lambda: {'latencies': [], 'errors': 0})
+    while time.monotonic() < deadline:
+        name = rng.choices(names, weights)[0]
+        path, body = builders[name](rng)
+        request = Request(base_url + path, data=body)
+        start = time.perf_counter()
+        try:
+            with urlopen(request, timeout=timeout) as response:
+                response.read()
+            ok = True
+        except HTTPError as error:
+            error.read()
+            ok = error.code < 400
+        except (URLError, OSError):
+            ok = False
+        elapsed = time.perf_counter() - start
+        local[name]['latencies'].append(elapsed)
+        if not ok:
+            local[name]['errors'] += 1
+    with lock:
+        for name, stats in local.items():
+            results[name]['latencies'].extend(stats['latencies'])
+            results[name]['errors'] += stats['errors']
+
+
+def percentile(ordered, fraction):
+    # Nearest rank.
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def summarize(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    ms = lambda value: None if value is None else round(value * 1000, 2)
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'throughput_rps': round(len(ordered) / elapsed, 2),
+        'mean_ms': ms(sum(ordered) / len(ordered)) if ordered else None,
+        'p50_ms': ms(percentile(ordered, 0.50)),
+        'p95_ms': ms(percentile(ordered, 0.95)),
+        'p99_ms': ms(percentile(ordered, 0.99)),
+        'max_ms': ms(ordered[-1]) if ordered else None
+    }
+
+
+def run(args):
+    app = bench_app()
+    with app.app_context():
+        max_venue = db.session.query(db.func.max(Venue.id)).scalar()
+        max_artist = db.session.query(db.func.max(Artist.id)).scalar()
+    if not max_venue or not max_artist:
+        sys.exit('Nothing to request; run `loadtest.py seed` first.')
+
+    mix = routes(max_venue, max_artist, args.writes)
+    base_url = args.url.rstrip('/')
+    results = defaultdict(lambda: {'latencies': [], 'errors': 0})
+    lock = threading.Lock()
+
+    if args.warmup:
+        deadline = time.monotonic() + args.warmup
+        warmup = defaultdict(lambda: {'latencies': [], 'errors': 0})
+        threads = [threading.Thread(target=worker, args=(
+            base_url, mix, deadline, -n - 1, args.timeout, warmup, lock))
+            for n in range(args.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    start = time.monotonic()
+    deadline = start + args.duration
+    threads = [threading.Thread(target=worker, args=(
+        base_url, mix, deadline, args.seed + n, args.timeout, results, lock))
+        for n in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    everything = [latency for stats in results.values() for latency in stats['latencies']]
+    report = {
+        'url': base_url,
+        'concurrency': args.concurrency,
+        'duration_s': round(elapsed, 2),
+        'writes': args.writes,
+        'seed': args.seed,
+        'dataset': {'venues': max_venue, 'artists': max_artist},
+        'total': summarize(everything, sum(stats['errors'] for stats in results.values()), elapsed),
+        'routes': dict((name, summarize(stats['latencies'], stats['errors'], elapsed))
+                       for name, stats in sorted(results.items()))
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+def compare(args):
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    print('{:<24} {:>10} {:>10} {:>10} {:>10} {:>10} {:>10}'.format(
+        'route', 'rps', 'rps\'', 'p95', 'p95\'', 'p99', 'p99\''))
+    rows = [('total', before['total'], after['total'])]
+    rows += [(name, before['routes'].get(name, {}), after['routes'].get(name, {}))
+             for name in sorted(set(before['routes']) | set(after['routes']))]
+    for name, old, new in rows:
+        print('{:<24} {:>10} {:>10} {:>10} {:>10} {:>10} {:>10}'.format(
+            name, old.get('throughput_rps', '-'), new.get('throughput_rps', '-'),
+            old.get('p95_ms', '-'), new.get('p95_ms', '-'),
+            old.get('p99_ms', '-'), new.get('p99_ms', '-')))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help='replace the benchmark data')
+    seed_parser.add_argument('--scale', type=int, default=1,
+                             help='multiples of {} venues, {} artists and {} shows'.format(
+                                 VENUES, ARTISTS, SHOWS))
+
+    run_parser = commands.add_parser('run', help='drive a running server')
+    run_parser.add_argument('--url', default='http://127.0.0.1:5000')
+    run_parser.add_argument('--concurrency', type=int, default=8)
+    run_parser.add_argument('--duration', type=float, default=30, help='seconds')
+    run_parser.add_argument('--warmup', type=float, default=5, help='seconds, not reported')
+    run_parser.add_argument('--timeout', type=float, default=30, help='per request, seconds')
+    run_parser.add_argument('--seed', type=int, default=1)
+    run_parser.add_argument('--writes', action='store_true',
+                            help='also submit the create venue/artist forms')
+    run_parser.add_argument('--output', help='write the JSON report here as well')
+
+    compare_parser = commands.add_parser('compare', help='compare two JSON reports')
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+
+    args = parser.parse_args()
+    if args.command == 'seed':
+        app = bench_app()
+        with app.app_context():
+            print(json.dumps(seed(args.scale), indent=2))
+    elif args.command == 'run':
+        run(args)
+    else:
+        compare(args)
+
+
+if __name__ == '__main__':
+    main()
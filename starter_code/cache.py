@@ -0,0 +1,190 @@
+#----------------------------------------------------------------------------#
+# Cache.
+#----------------------------------------------------------------------------#
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import session
+
+
+#  Backends
+#  ----------------------------------------------------------------
+
+class LRUCache(object):
+    # In-process, bounded, with a per-entry expiry. Each worker process has
+    # its own copy.
+
+    def __init__(self, maxsize=512, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        # A scan of every key: for rare invalidations, not the request path.
+        with self._lock:
+            for key in [key for key in self._data if key.startswith(prefix)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisCache(object):
+    # Shared between every worker and dyno; needs the optional `redis` package.
+
+    def __init__(self, url, prefix='fyyur:', ttl=300):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl or None)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class NullCache(object):
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def clear(self):
+        pass
+
+
+#  Page cache
+#  ----------------------------------------------------------------
+
+class PageCache(object):
+
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        self.hits = 0
+        self.misses = 0
+        # Called with True for a hit and False for a miss.
+        self.listeners = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_TYPE', 'lru')
+        app.config.setdefault('CACHE_MAX_ENTRIES', 512)
+        app.config.setdefault('CACHE_DEFAULT_TTL', 300)
+        app.config.setdefault('CACHE_REDIS_URL', None)
+        app.config.setdefault('CACHE_KEY_PREFIX', 'fyyur:')
+
+        cache_type = app.config['CACHE_TYPE']
+        ttl = app.config['CACHE_DEFAULT_TTL']
+        if cache_type == 'lru':
+            self.backend = LRUCache(app.config['CACHE_MAX_ENTRIES'], ttl)
+        elif cache_type == 'redis':
+            self.backend = RedisCache(app.config['CACHE_REDIS_URL'],
+                                      app.config['CACHE_KEY_PREFIX'], ttl)
+        elif cache_type == 'null':
+            self.backend = NullCache()
+        else:
+            raise ValueError('Unknown CACHE_TYPE: {}'.format(cache_type))
+        app.extensions['page_cache'] = self
+
+    def cached(self, key, ttl=None):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                # Pending flash messages are rendered into the layout, so a
+                # page carrying them must neither be served from nor stored in
+                # the cache.
+                if '_flashes' in session:
+                    return view(*args, **kwargs)
+                body = self.get(key)
+                if body is not None:
+                    return body
+                body = view(*args, **kwargs)
+                if isinstance(body, str):
+                    self.set(key, body, ttl)
+                return body
+            return wrapper
+        return decorator
+
+    def get(self, key):
+        # Counted as a hit or a miss, like the cached pages.
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            self._notify(True)
+        else:
+            self.misses += 1
+            self._notify(False)
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, value, ttl)
+
+    def _notify(self, hit):
+        for listener in self.listeners:
+            listener(hit)
+
+    def invalidate(self, *keys):
+        self.backend.delete(*keys)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,133 @@
+#----------------------------------------------------------------------------#
+# Response compression.
+#----------------------------------------------------------------------------#
+
+# Compresses HTML and JSON responses with brotli or gzip, whichever the
+# client's Accept-Encoding ranks higher (brotli on a tie). Bodies under
+# COMPRESS_MIN_SIZE go out as they are: the framing would eat the saving.
+#
+# Streamed responses are compressed chunk by chunk and flushed after each
+# one, so the browser still gets the top of the page while the rest is
+# rendered. Files (direct_passthrough, e.g. the pre-compressed bundles in
+# static/dist/) and responses that already carry a Content-Encoding are
+# left alone.
+#
+# A compressed response's ETag is made weak: the bytes differ per encoding,
+# but the content, and so revalidation, doesn't.
+
+import gzip
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class _Gzip(object):
+
+    def __init__(self, level):
+        # wbits=31: zlib stream in a gzip container
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, chunk):
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _Brotli(object):
+
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=quality)
+
+    def compress(self, chunk):
+        return self._compressor.process(chunk) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, mode=brotli.MODE_TEXT, quality=level)
+    return gzip.compress(data, level, mtime=0)
+
+
+def _compress_stream(chunks, compressor):
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk:
+                yield compressor.compress(chunk)
+        yield compressor.finish()
+    finally:
+        # The WSGI server closes this generator, not the one it wraps.
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+class Compress(object):
+
+    def __init__(self, app=None):
+        self.levels = {}
+        self.mimetypes = ()
+        self.min_size = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_MIMETYPES', ['text/html', 'application/json'])
+        app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+        app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+        app.config.setdefault('COMPRESS_BR_LEVEL', 4)
+
+        self.mimetypes = frozenset(app.config['COMPRESS_MIMETYPES'])
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        # In order of preference.
+        self.levels = {}
+        if brotli is not None and app.config['COMPRESS_BR_LEVEL'] is not None:
+            self.levels['br'] = app.config['COMPRESS_BR_LEVEL']
+        if app.config['COMPRESS_GZIP_LEVEL'] is not None:
+            self.levels['gzip'] = app.config['COMPRESS_GZIP_LEVEL']
+
+        app.after_request(self._compress_response)
+        app.extensions['compress'] = self
+
+    def _compress_response(self, response):
+        if response.mimetype not in self.mimetypes or not self.levels:
+            return response
+        # The body varies with Accept-Encoding even when this one isn't
+        # compressed, say because it is under the threshold.
+        response.vary.add('Accept-Encoding')
+        if (response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.status_code < 200
+                or response.status_code in (204, 304)
+                or response.cache_control.no_transform):
+            return response
+
+        encoding = request.accept_encodings.best_match(list(self.levels))
+        if encoding is None:
+            return response
+        level = self.levels[encoding]
+
+        if response.is_streamed:
+            compressor = _Brotli(level) if encoding == 'br' else _Gzip(level)
+            response.response = _compress_stream(response.response, compressor)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(compress(data, encoding, level))
+
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -1,12 +1,15 @@
 
 import os
 
-SECRET_KEY = os.urandom(32)
+# Set SECRET_KEY in production: a random key differs per process, so
+# sessions and flashed messages wouldn't survive a worker restart.
+SECRET_KEY = os.environ.get('SECRET_KEY') or os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+# Debug mode only when asked for (FLASK_ENV=development or FLASK_DEBUG=1),
+# never under the production WSGI server.
+DEBUG = os.environ.get('FLASK_DEBUG') == '1' or os.environ.get('FLASK_ENV') == 'development'
 
 # Connect to the database
 
@@ -15,5 +18,90 @@ username = 'eliassun'
 #password = 'postgres'
 url = 'localhost:5432'
 
-SQLALCHEMY_DATABASE_URI = "postgresql://{}@{}/{}".format(
-        username, url, DATABASE_NAME)
\ No newline at end of file
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', "postgresql://{}@{}/{}".format(
+        username, url, DATABASE_NAME)).replace('postgres://', 'postgresql://', 1)
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool, see engine.py. Size it so that
+# workers * threads <= DB_POOL_SIZE + DB_MAX_OVERFLOW per process.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+
+# statement_timeout in milliseconds for the role this process runs as
+# (web requests vs. CLI/background work); 0 disables it.
+APP_ROLE = os.environ.get('APP_ROLE', 'web')
+DB_STATEMENT_TIMEOUTS = {
+    'web': int(os.environ.get('DB_STATEMENT_TIMEOUT_WEB', 5000)),
+    'worker': int(os.environ.get('DB_STATEMENT_TIMEOUT_WORKER', 0))
+}
+
+# Read replicas for GET requests, comma separated; see routing.py.
+SQLALCHEMY_REPLICA_URIS = [uri.strip().replace('postgres://', 'postgresql://', 1)
+                           for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',')
+                           if uri.strip()]
+REPLICA_RETRY_AFTER = 30
+REPLICA_READ_YOUR_WRITES = 10
+
+# Set when DATABASE_URL points at pgbouncer in pool_mode=transaction.
+PGBOUNCER_TRANSACTION_MODE = os.environ.get('PGBOUNCER_TRANSACTION_MODE', '0') == '1'
+
+# Dates are stored naive in STORAGE_TIMEZONE and shown in the request's
+# timezone (?tz= or the tz cookie), DEFAULT_TIMEZONE otherwise.
+DEFAULT_LOCALE = 'en'
+SUPPORTED_LOCALES = ['en']
+DEFAULT_TIMEZONE = 'UTC'
+STORAGE_TIMEZONE = 'UTC'
+
+# Per-request SQL budget; requests over it, or repeating one statement
+# SQL_REPEAT_THRESHOLD times (likely N+1), are logged as warnings.
+SQL_QUERY_BUDGET = int(os.environ.get('SQL_QUERY_BUDGET', 20))
+SQL_TIME_BUDGET_MS = int(os.environ.get('SQL_TIME_BUDGET_MS', 250))
+SQL_REPEAT_THRESHOLD = 5
+SQL_DEBUG_ENDPOINT = DEBUG
+
+# Compiled templates, shared by the workers on a host (see templating.py).
+# TEMPLATE_WARMUP=1 renders every page once at boot.
+JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR',
+                                          os.path.join(basedir, '.jinja_cache'))
+TEMPLATE_WARMUP = os.environ.get('TEMPLATE_WARMUP') == '1'
+
+# CSS/JS bundles built by `flask build-assets` (see assets.py). Their names
+# change with their content, so browsers and CDNs may keep them for a year.
+ASSETS_BUNDLED = not DEBUG
+ASSETS_MAX_AGE = 365 * 24 * 3600
+
+# Compression of HTML/JSON responses (see compression.py). Levels are a
+# trade of CPU per request for bytes on the wire; None turns an encoding off.
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 500))
+COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+COMPRESS_BR_LEVEL = int(os.environ.get('COMPRESS_BR_LEVEL', 4))
+
+# Listing page sizes
+SHOWS_PER_PAGE = 30
+ARTISTS_PER_PAGE = 50
+SEARCH_RESULTS_PER_PAGE = 20
+BROWSE_RESULTS_PER_PAGE = 20
+
+# Most shows one schedule request may create
+SHOW_BATCH_LIMIT = 500
+
+# Widest window /api/venues/<id>/availability answers for
+AVAILABILITY_MAX_DAYS = 92
+
+# Rows fetched per round trip when streaming a full listing
+STREAM_BATCH_SIZE = 1000
+
+# Page cache: 'lru' (per process), 'redis' (shared, needs the redis package) or 'null'
+CACHE_TYPE = os.environ.get('CACHE_TYPE', 'lru')
+CACHE_MAX_ENTRIES = 512
+CACHE_DEFAULT_TTL = 300
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+
+# Rendered list tiles, per process (see fragments.py); 0 turns it off.
+FRAGMENT_CACHE_MAX_ENTRIES = int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', 10000))
+
+# JSON API: clients and CDNs revalidate with ETag / Last-Modified on every use
+API_CACHE_CONTROL = 'public, no-cache'
@@ -0,0 +1,187 @@
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+# Venue and Artist carry upcoming_shows_count / past_shows_count so list
+# pages can show and sort by them without aggregating Show. A show counts as
+# upcoming while it starts after ShowCountWatermark.rolled_over_at; the
+# counters are therefore exact as of the last rollover:
+#
+#   flask rollover-show-counts    # from cron, every few minutes
+#   flask recount-show-counts     # after loading shows behind the ORM's back
+#
+# All of it runs on one clock, naive UTC: Show.start_time is stored in UTC,
+# the watermark is seeded and moved in UTC, and "upcoming" elsewhere
+# (queries.py) is judged against datetime.utcnow().
+#
+# Inserts, deletes and updates through the ORM adjust the counters in the
+# same transaction. They take a share lock on the watermark row, and the
+# rollover an exclusive one, so a show can't be classified against a
+# watermark that is being moved.
+
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event, inspect, text
+
+from models import db, Show
+
+WATERMARK = '(SELECT rolled_over_at FROM "ShowCountWatermark" WHERE id = 1 FOR SHARE) AS w'
+
+# (table, Show foreign key)
+COUNTED = (('Venue', 'venue_id'), ('Artist', 'artist_id'))
+
+
+#  Per show, from the ORM
+#  ----------------------------------------------------------------
+
+def _adjust(connection, table, entity_id, start_time, delta, touch=False):
+    # touch also bumps updated_at, for changes the venue/artist's own
+    # version would otherwise miss.
+    connection.execute(text(
+        'UPDATE "{table}" SET {touch}'
+        'upcoming_shows_count = upcoming_shows_count + '
+        'CASE WHEN CAST(:start_time AS timestamp) > w.rolled_over_at THEN :delta ELSE 0 END, '
+        'past_shows_count = past_shows_count + '
+        'CASE WHEN CAST(:start_time AS timestamp) > w.rolled_over_at THEN 0 ELSE :delta END '
+        'FROM {watermark} WHERE "{table}".id = :id'.format(
+            table=table, watermark=WATERMARK,
+            touch="updated_at = (now() at time zone 'utc'), " if touch else '')),
+        {'id': entity_id, 'start_time': start_time, 'delta': delta})
+
+
+@event.listens_for(Show, 'after_insert')
+def _show_inserted(mapper, connection, show):
+    for table, key in COUNTED:
+        _adjust(connection, table, getattr(show, key), show.start_time, 1)
+
+
+@event.listens_for(Show, 'before_delete')
+def _show_deleted(mapper, connection, show):
+    # A deleted show leaves no updated_at behind, so the venue's and artist's
+    # are bumped: their detail versions (ETag, Last-Modified) must change.
+    for table, key in COUNTED:
+        _adjust(connection, table, getattr(show, key), show.start_time, -1, touch=True)
+
+
+@event.listens_for(Show, 'after_update')
+def _show_updated(mapper, connection, show):
+    state = inspect(show)
+
+    def previous(attribute):
+        history = state.attrs[attribute].history
+        return history.deleted[0] if history.deleted else getattr(show, attribute)
+
+    old_start = previous('start_time')
+    for table, key in COUNTED:
+        old_id = previous(key)
+        if old_id != getattr(show, key) or old_start != show.start_time:
+            _adjust(connection, table, old_id, old_start, -1)
+            _adjust(connection, table, getattr(show, key), show.start_time, 1)
+
+
+#  In bulk
+#  ----------------------------------------------------------------
+
+def bulk_adjust_sql(table, ref, start_time, source, where='true'):
+    # Adds the shows in `source` (e.g. the importer's staging table) to the
+    # counters; `ref`, `start_time` and `where` are SQL over its columns.
+    return (
+        'UPDATE "{table}" t SET '
+        'upcoming_shows_count = t.upcoming_shows_count + c.upcoming, '
+        'past_shows_count = t.past_shows_count + c.past '
+        'FROM (SELECT {ref} AS id, '
+        'count(*) FILTER (WHERE {start_time} > w.rolled_over_at) AS upcoming, '
+        'count(*) FILTER (WHERE {start_time} <= w.rolled_over_at) AS past '
+        'FROM {source} s, {watermark} WHERE {where} GROUP BY 1) c '
+        'WHERE t.id = c.id').format(table=table, ref=ref, start_time=start_time,
+                                    source=source, where=where, watermark=WATERMARK)
+
+
+def _lock_watermark(connection):
+    return connection.execute(text(
+        'SELECT rolled_over_at FROM "ShowCountWatermark" WHERE id = 1 FOR UPDATE')).scalar()
+
+
+def rollover(connection, now=None):
+    # Moves the shows that started since the last rollover from upcoming to
+    # past: a range scan of Show(start_time) rather than a recount.
+    now = now or datetime.utcnow()
+    since = _lock_watermark(connection)
+    if now <= since:
+        return 0
+    params = {'since': since, 'until': now}
+    moved = connection.execute(text(
+        'SELECT count(*) FROM "Show" WHERE start_time > :since AND start_time <= :until'),
+        params).scalar()
+    if moved:
+        for table, key in COUNTED:
+            connection.execute(text(
+                'UPDATE "{table}" t SET '
+                'upcoming_shows_count = t.upcoming_shows_count - c.n, '
+                'past_shows_count = t.past_shows_count + c.n '
+                'FROM (SELECT {key} AS id, count(*) AS n FROM "Show" '
+                'WHERE start_time > :since AND start_time <= :until GROUP BY {key}) c '
+                'WHERE t.id = c.id'.format(table=table, key=key)), params)
+    connection.execute(text('UPDATE "ShowCountWatermark" SET rolled_over_at = :until WHERE id = 1'),
+                       params)
+    return moved
+
+
+def recount(connection, now=None):
+    # Rebuilds every counter from Show. Only rows whose counts change are
+    # written.
+    now = now or datetime.utcnow()
+    _lock_watermark(connection)
+    connection.execute(text('UPDATE "ShowCountWatermark" SET rolled_over_at = :now WHERE id = 1'),
+                       {'now': now})
+    changed = 0
+    for table, key in COUNTED:
+        changed += connection.execute(text(
+            'UPDATE "{table}" t SET '
+            'upcoming_shows_count = coalesce(c.upcoming, 0), '
+            'past_shows_count = coalesce(c.past, 0) '
+            'FROM "{table}" e LEFT JOIN ('
+            '  SELECT {key} AS id, '
+            '  count(*) FILTER (WHERE start_time > :now) AS upcoming, '
+            '  count(*) FILTER (WHERE start_time <= :now) AS past '
+            '  FROM "Show" GROUP BY {key}'
+            ') c ON c.id = e.id '
+            'WHERE t.id = e.id AND (t.upcoming_shows_count, t.past_shows_count) '
+            'IS DISTINCT FROM (coalesce(c.upcoming, 0), coalesce(c.past, 0))'.format(
+                table=table, key=key)), {'now': now}).rowcount
+    return changed
+
+
+#  Commands
+#  ----------------------------------------------------------------
+
+@click.command('rollover-show-counts')
+@with_appcontext
+def rollover_show_counts():
+    """Move shows that have started from the upcoming to the past counters."""
+    try:
+        moved = rollover(db.session.connection())
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        db.session.close()
+    click.echo('{} shows rolled over'.format(moved))
+
+
+@click.command('recount-show-counts')
+@with_appcontext
+def recount_show_counts():
+    """Rebuild the venue and artist show counters from the Show table."""
+    try:
+        changed = recount(db.session.connection())
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        db.session.close()
+    click.echo('{} venues/artists corrected'.format(changed))
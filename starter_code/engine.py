@@ -0,0 +1,137 @@
+#----------------------------------------------------------------------------#
+# Database engine.
+#----------------------------------------------------------------------------#
+
+import bisect
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+
+#  Pool checkout metrics
+#  ----------------------------------------------------------------
+
+class PoolStats(object):
+    # Time spent waiting for a pooled connection, as a cumulative histogram.
+    # If waits grow, there are more worker threads than connections.
+
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Called with (wait_seconds, timed_out) after every checkout attempt.
+        self.listeners = []
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.buckets = [0] * (len(self.BUCKETS) + 1)
+
+    def observe(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self.buckets[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+
+    def timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def notify(self, seconds, timed_out):
+        for listener in self.listeners:
+            listener(seconds, timed_out)
+
+    def snapshot(self):
+        with self._lock:
+            cumulative = 0
+            histogram = {}
+            for bound, count in zip(self.BUCKETS + ('+Inf',), self.buckets):
+                cumulative += count
+                histogram[str(bound)] = cumulative
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_total,
+                "wait_seconds_max": self.wait_max,
+                "wait_seconds_avg": self.wait_total / self.checkouts if self.checkouts else 0.0,
+                "wait_seconds_histogram": histogram
+            }
+
+
+pool_stats = PoolStats()
+
+
+class StatementTimeoutPool(QueuePool):
+    # Set by engine_options() when the timeout has to be applied per
+    # transaction rather than per connection (pgbouncer transaction mode).
+    local_statement_timeout = None
+
+
+class TimedQueuePool(StatementTimeoutPool):
+    # The primary's pool: its checkout waits are what pool_stats records.
+    # Replica engines (routing.py) use a StatementTimeoutPool instead, so
+    # their waits don't blur the primary's.
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super(TimedQueuePool, self)._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            pool_stats.timeout()
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            pool_stats.observe(waited)
+            pool_stats.notify(waited, timed_out)
+
+
+@event.listens_for(StatementTimeoutPool, 'checkout')
+def _set_local_statement_timeout(dbapi_connection, connection_record, connection_proxy):
+    timeout = StatementTimeoutPool.local_statement_timeout
+    if timeout:
+        # psycopg2 opens a transaction here; SET LOCAL lasts until the
+        # connection is returned, committed or rolled back.
+        cursor = dbapi_connection.cursor()
+        cursor.execute('SET LOCAL statement_timeout = %s', (timeout,))
+        cursor.close()
+
+
+#  Configuration
+#  ----------------------------------------------------------------
+
+def engine_options(config):
+    timeout = config['DB_STATEMENT_TIMEOUTS'].get(config['APP_ROLE'])
+    options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING']
+    }
+    if config['PGBOUNCER_TRANSACTION_MODE']:
+        # pgbouncer hands out a different server connection per transaction
+        # and rejects libpq startup options, so session-level settings can't
+        # be used; the timeout is set per transaction on checkout instead.
+        StatementTimeoutPool.local_statement_timeout = timeout
+    else:
+        StatementTimeoutPool.local_statement_timeout = None
+        if timeout:
+            options['connect_args'] = {'options': '-c statement_timeout={}'.format(timeout)}
+    return options
+
+
+def configure_engine(app):
+    options = engine_options(app.config)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    app.config.setdefault('SQLALCHEMY_TRACK_MODIFICATIONS', False)
@@ -0,0 +1,89 @@
+#----------------------------------------------------------------------------#
+# Date formatting.
+#----------------------------------------------------------------------------#
+
+from functools import lru_cache
+
+from flask import current_app, g, has_request_context, request
+
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma"
+}
+
+
+# Babel is imported on first use, not at start-up; both callers are cached.
+
+@lru_cache(maxsize=256)
+def compiled_pattern(format, locale):
+    # Parsing a CLDR pattern and resolving a locale are the expensive parts of
+    # babel.dates.format_datetime; both are done once per (format, locale).
+    import babel.dates
+    from babel import Locale
+    return babel.dates.parse_pattern(FORMATS.get(format, format)), Locale.parse(locale)
+
+
+@lru_cache(maxsize=64)
+def _timezone(name):
+    import babel.dates
+    return babel.dates.get_timezone(name)
+
+
+def current_locale():
+    if has_request_context() and 'locale' in g:
+        return g.locale
+    return current_app.config['DEFAULT_LOCALE']
+
+
+def current_timezone():
+    if has_request_context() and 'timezone' in g:
+        return g.timezone
+    return current_app.config['DEFAULT_TIMEZONE']
+
+
+def format_datetime(value, format='medium', locale=None, timezone=None):
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        # Strings are still accepted from older callers.
+        import dateutil.parser
+        value = dateutil.parser.parse(value)
+
+    timezone = timezone or current_timezone()
+    storage_timezone = current_app.config['STORAGE_TIMEZONE']
+    if timezone != storage_timezone:
+        if value.tzinfo is None:
+            storage = _timezone(storage_timezone)
+            value = storage.localize(value) if hasattr(storage, 'localize') \
+                else value.replace(tzinfo=storage)
+        value = value.astimezone(_timezone(timezone))
+
+    pattern, locale = compiled_pattern(format, locale or current_locale())
+    return pattern.apply(value, locale)
+
+
+def select_locale():
+    # ?locale= / ?tz= override the cookies, which override Accept-Language
+    # and the configured defaults.
+    config = current_app.config
+    locale = request.args.get('locale') or request.cookies.get('locale') \
+        or request.accept_languages.best_match(config['SUPPORTED_LOCALES'])
+    if locale in config['SUPPORTED_LOCALES']:
+        g.locale = locale
+
+    timezone = request.args.get('tz') or request.cookies.get('tz')
+    if timezone:
+        try:
+            _timezone(timezone)
+        except LookupError:
+            return
+        g.timezone = timezone
+
+
+def init_app(app):
+    app.config.setdefault('DEFAULT_LOCALE', 'en')
+    app.config.setdefault('SUPPORTED_LOCALES', ['en'])
+    app.config.setdefault('DEFAULT_TIMEZONE', 'UTC')
+    app.config.setdefault('STORAGE_TIMEZONE', 'UTC')
+    app.jinja_env.filters['datetime'] = format_datetime
+    app.before_request(select_locale)
@@ -1,12 +1,14 @@
 from datetime import datetime
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL, ValidationError 
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, \
+    IntegerField, DateField, TextAreaField
+from wtforms.validators import DataRequired, AnyOf, URL, ValidationError, Optional, NumberRange
 import re
 
+US_PHONE_NUM = '^([0-9]{10})$'
+
 def validate_phone(self, phone):
-    us_phone_num = '^([0-9]{10})$'
-    match = re.search(us_phone_num, phone.data)
+    match = re.search(US_PHONE_NUM, phone.data)
     if not match:
         raise ValidationError('Phone number must be 10 digtis.')
 
@@ -22,6 +24,75 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    # Optional; shows last three hours (models.DEFAULT_SHOW_LENGTH) otherwise.
+    end_time = DateTimeField(
+        'end_time',
+        validators=[Optional()]
+    )
+
+class ShowBatchForm(Form):
+    # Either `dates`, one per line, or a recurrence from `start_time`.
+    artist_id = IntegerField(
+        'artist_id', validators=[DataRequired()]
+    )
+    venue_id = IntegerField(
+        'venue_id', validators=[DataRequired()]
+    )
+    dates = TextAreaField(
+        'dates'
+    )
+    start_time = DateTimeField(
+        'start_time', format='%Y-%m-%d %H:%M', validators=[Optional()]
+    )
+    frequency = SelectField(
+        'frequency', default='weekly', validators=[Optional()],
+        choices=[
+            ('weekly', 'Every week'),
+            ('daily', 'Every day'),
+            ('monthly', 'Every month'),
+        ]
+    )
+    interval = IntegerField(
+        'interval', default=1, validators=[Optional(), NumberRange(min=1)]
+    )
+    until = DateField(
+        'until', validators=[Optional()]
+    )
+    # Length of each show, in minutes.
+    duration = IntegerField(
+        'duration', default=180, validators=[DataRequired(), NumberRange(min=1, max=24 * 60)]
+    )
+
+    def __init__(self, *args, limit=None, **kwargs):
+        super(ShowBatchForm, self).__init__(*args, **kwargs)
+        self.limit = limit
+        self.start_times = []
+
+    def validate(self, **kwargs):
+        from scheduling import SchedulingError, parse_dates, recurrence
+
+        if not super(ShowBatchForm, self).validate(**kwargs):
+            return False
+        try:
+            if self.dates.data and self.dates.data.strip():
+                self.start_times = parse_dates(self.dates.data)
+                if self.limit and len(self.start_times) > self.limit:
+                    raise SchedulingError('At most {} dates at a time.'.format(self.limit))
+            elif self.start_time.data and self.until.data:
+                if not self.frequency.data:
+                    raise SchedulingError('Pick how often the show repeats.')
+                self.start_times = recurrence(self.start_time.data, self.frequency.data,
+                                              self.until.data, self.interval.data or 1,
+                                              self.limit)
+            else:
+                raise SchedulingError('List the dates, or give a first show and an end date.')
+        except SchedulingError as error:
+            self.dates.errors.append(str(error))
+            return False
+        if not self.start_times:
+            self.dates.errors.append('No dates to schedule.')
+            return False
+        return True
 
 class VenueForm(Form):
     name = StringField(
@@ -0,0 +1,110 @@
+#----------------------------------------------------------------------------#
+# Template fragment cache.
+#----------------------------------------------------------------------------#
+
+# {% cache 'show', show.id, show.version %} ... {% endcache %} renders its
+# body once and serves it from a bounded per-process LRU afterwards. The
+# first two arguments name the entity (kind and id), the rest is whatever
+# else the fragment depends on, typically its updated_at. The request's
+# locale and timezone are added to the key too, since the datetime filter
+# depends on them; a context processor works them out once per page rather
+# than once per fragment.
+#
+# Because the version is part of the key, an edit made through another
+# worker is picked up here too: the new updated_at misses and the old entry
+# ages out. The edit handlers also call invalidate(kind, id), which drops
+# this process's entries for the entity straight away.
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+from cache import LRUCache, NullCache
+import formatting
+
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super(FragmentCacheExtension, self).__init__(environment)
+        # Set by FragmentCache.init_app; until then the tag only renders.
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        if len(parts) < 2:
+            parser.fail('cache needs at least a kind and an id', lineno)
+        parts.append(nodes.Name('fragment_scope', 'load'))
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', [nodes.List(parts)]),
+                               [], [], body).set_lineno(lineno)
+
+    def _render(self, parts, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        return cache.fetch(parts, caller)
+
+
+def _key(kind, entity_id):
+    return '{}:{}:'.format(kind, entity_id)
+
+
+def _scope():
+    return {'fragment_scope': '{}:{}'.format(formatting.current_locale(),
+                                             formatting.current_timezone())}
+
+
+class FragmentCache(object):
+
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        self.hits = 0
+        self.misses = 0
+        # Called with True for a hit and False for a miss (see metrics.py).
+        self.listeners = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FRAGMENT_CACHE_MAX_ENTRIES', 10000)
+        size = app.config['FRAGMENT_CACHE_MAX_ENTRIES']
+        # No expiry: a stale fragment can only be reached with its old key.
+        self.backend = LRUCache(size, ttl=None) if size else NullCache()
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        app.jinja_env.fragment_cache = self
+        app.context_processor(_scope)
+        app.extensions['fragment_cache'] = self
+
+    def fetch(self, parts, render):
+        key = ':'.join(map(str, parts))
+        fragment = self.backend.get(key)
+        if fragment is not None:
+            self.hits += 1
+            self._notify(True)
+            return fragment
+        self.misses += 1
+        self._notify(False)
+        fragment = render()
+        self.backend.set(key, fragment)
+        return fragment
+
+    def _notify(self, hit):
+        for listener in self.listeners:
+            listener(hit)
+
+    def invalidate(self, kind, entity_id):
+        if isinstance(self.backend, LRUCache):
+            self.backend.delete_prefix(_key(kind, entity_id))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.backend) if isinstance(self.backend, LRUCache) else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,66 @@
+#----------------------------------------------------------------------------#
+# gunicorn configuration.
+#----------------------------------------------------------------------------#
+
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Every setting can be overridden from the environment (WEB_CONCURRENCY,
+# GUNICORN_THREADS, ...) or the command line. Keep threads at or below
+# DB_POOL_SIZE + DB_MAX_OVERFLOW, or threads will queue for connections
+# (see /db/stats).
+#
+# Reloading: with preload_app the code lives in the master, so HUP only
+# restarts workers on the old code. To deploy new code without dropping
+# requests, send USR2 (starts a new master alongside the old one), then
+# WINCH and QUIT to the old master once the new workers are up.
+
+import multiprocessing
+import os
+import tempfile
+
+bind = '0.0.0.0:{}'.format(os.environ.get('PORT', 8000))
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Import the app once in the master and fork it: workers boot faster and
+# share the imported code pages copy-on-write.
+preload_app = True
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+# Recycle workers now and then so slow leaks can't accumulate; the jitter
+# keeps them from all restarting at once.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+
+# prometheus_client picks its storage mode at import, which happens in the
+# master with preload_app, so this has to be set before the app is loaded.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR',
+                      os.path.join(tempfile.gettempdir(), 'fyyur-metrics'))
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def on_starting(server):
+    # Samples left over from a previous run would be added to this one's.
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    for name in os.listdir(directory):
+        if name.endswith('.db'):
+            os.remove(os.path.join(directory, name))
+
+
+def post_fork(server, worker):
+    # The master imported the app; make sure no pooled connection crossed
+    # the fork, or two processes would talk over the same socket.
+    from models import db
+    app = server.app.wsgi()
+    db.dispose(app)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
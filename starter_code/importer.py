@@ -0,0 +1,309 @@
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+# Loads whole catalogues of venues, artists or shows from CSV or NDJSON:
+#
+#   flask import-data venues venues.csv
+#   flask import-data shows shows.ndjson
+#
+# Rows are COPYed into a temporary staging table, checked in SQL against the
+# validators declared on VenueForm / ArtistForm / ShowForm, and the valid ones
+# are moved into the real table with a single INSERT ... SELECT. Everything
+# runs in one transaction.
+
+import csv
+import re
+import time
+
+import click
+from flask.cli import with_appcontext
+from wtforms import SelectMultipleField
+from wtforms.validators import DataRequired, URL
+
+from counters import bulk_adjust_sql
+from forms import VenueForm, ArtistForm, ShowForm, validate_phone, US_PHONE_NUM
+from models import db, page_cache, DEFAULT_SHOW_LENGTH, Venue, Artist
+from queries import facet_summary_key
+
+TRUE_VALUES = ['1', 't', 'true', 'y', 'yes', 'on']
+GENRE_SEPARATOR = r'\s*,\s*'
+SAMPLE_ERRORS = 10
+
+
+class ImportSpec(object):
+
+    def __init__(self, table, form, fields, columns, prepare=None, finish=None,
+                 cache_keys=()):
+        self.table = table
+        self.form = form
+        # Staging columns, named after the form fields.
+        self.fields = fields
+        # Target column -> SQL expression over the staging table.
+        self.columns = columns
+        # Statements run after validation, before rows are moved (e.g. FK lookup).
+        self.prepare = prepare or []
+        # Statements run after the rows are moved (e.g. counter updates).
+        self.finish = finish or []
+        # Page cache keys dropped once an import commits, as the matching
+        # write handlers in app.py do.
+        self.cache_keys = cache_keys
+
+
+def _genres(column):
+    return "regexp_split_to_array(trim({}), '{}')".format(column, GENRE_SEPARATOR)
+
+
+def _flag(column):
+    return "coalesce(lower(trim({})), '') = ANY(%(true_values)s)".format(column)
+
+
+# A show's time slot; with end_time left empty it lasts as long as
+# models.Show assumes.
+SHOW_START = 'pg_temp.fyyur_try_timestamp(start_time)'
+SHOW_END = "coalesce(pg_temp.fyyur_try_timestamp(end_time), {} + interval '{} seconds')".format(
+    SHOW_START, int(DEFAULT_SHOW_LENGTH.total_seconds()))
+
+ENTITY_FIELDS = ['name', 'city', 'state', 'phone', 'genres', 'image_link',
+                 'facebook_link', 'website_link', 'seeking_description']
+
+SPECS = {
+    'venues': ImportSpec(
+        table='Venue',
+        form=VenueForm,
+        fields=ENTITY_FIELDS + ['address', 'seeking_talent'],
+        columns={
+            'name': 'name', 'city': 'city', 'state': 'state', 'address': 'address',
+            'phone': 'phone', 'genres': _genres('genres'), 'image_link': 'image_link',
+            'facebook_link': 'facebook_link', 'website': 'website_link',
+            'seeking_talent': _flag('seeking_talent'),
+            'seeking_description': 'seeking_description'
+        },
+        cache_keys=('home', facet_summary_key(Venue))
+    ),
+    'artists': ImportSpec(
+        table='Artist',
+        form=ArtistForm,
+        fields=ENTITY_FIELDS + ['seeking_venue'],
+        columns={
+            'name': 'name', 'city': 'city', 'state': 'state', 'phone': 'phone',
+            'genres': _genres('genres'), 'image_link': 'image_link',
+            'facebook_link': 'facebook_link', 'website': 'website_link',
+            'seeking_venue': _flag('seeking_venue'),
+            'seeking_description': 'seeking_description'
+        },
+        cache_keys=('home', facet_summary_key(Artist))
+    ),
+    'shows': ImportSpec(
+        table='Show',
+        form=ShowForm,
+        # Shows reference artists and venues either by id or by exact name.
+        fields=['artist_id', 'venue_id', 'artist_name', 'venue_name', 'start_time', 'end_time'],
+        columns={
+            'artist_id': 'artist_ref',
+            'venue_id': 'venue_ref',
+            'start_time': 'lower(slot)',
+            'end_time': 'upper(slot)'
+        },
+        prepare=[
+            'ALTER TABLE import_staging ADD COLUMN artist_ref integer, ADD COLUMN venue_ref integer',
+            "UPDATE import_staging SET "
+            "artist_ref = CASE WHEN trim(artist_id) ~ '^[0-9]+$' THEN trim(artist_id)::integer END, "
+            "venue_ref = CASE WHEN trim(venue_id) ~ '^[0-9]+$' THEN trim(venue_id)::integer END",
+            'UPDATE import_staging s SET artist_ref = a.id FROM ('
+            '  SELECT DISTINCT ON (lower(name)) id, lower(name) AS key FROM "Artist" ORDER BY lower(name), id'
+            ') a WHERE s.artist_ref IS NULL AND lower(trim(s.artist_name)) = a.key',
+            'UPDATE import_staging s SET venue_ref = v.id FROM ('
+            '  SELECT DISTINCT ON (lower(name)) id, lower(name) AS key FROM "Venue" ORDER BY lower(name), id'
+            ') v WHERE s.venue_ref IS NULL AND lower(trim(s.venue_name)) = v.key',
+            "UPDATE import_staging s SET error = 'artist not found' WHERE error IS NULL "
+            'AND NOT EXISTS (SELECT 1 FROM "Artist" a WHERE a.id = s.artist_ref)',
+            "UPDATE import_staging s SET error = 'venue not found' WHERE error IS NULL "
+            'AND NOT EXISTS (SELECT 1 FROM "Venue" v WHERE v.id = s.venue_ref)',
+            "UPDATE import_staging SET error = 'end_time Not a valid datetime value.' "
+            "WHERE error IS NULL AND coalesce(trim(end_time), '') <> '' "
+            'AND pg_temp.fyyur_try_timestamp(end_time) IS NULL',
+            # ex_Show_venue_slot would abort the whole import on the first
+            # double booking, so overlapping rows are rejected beforehand:
+            # those overlapping a show already there, then those overlapping
+            # an earlier-starting row of the file (even one rejected by this
+            # same rule, which errs on the side of rejecting).
+            'ALTER TABLE import_staging ADD COLUMN slot tsrange',
+            'UPDATE import_staging SET slot = tsrange({start}, {end}) '
+            'WHERE error IS NULL AND {end} > {start}'.format(start=SHOW_START, end=SHOW_END),
+            "UPDATE import_staging SET error = 'end_time must be after start_time' "
+            'WHERE error IS NULL AND slot IS NULL',
+            "UPDATE import_staging s SET error = 'venue already has a show then' WHERE error IS NULL "
+            'AND EXISTS (SELECT 1 FROM "Show" x WHERE x.venue_id = s.venue_ref '
+            'AND tsrange(x.start_time, x.end_time) && s.slot)',
+            "UPDATE import_staging s SET error = 'overlaps an earlier show at the venue in this file' "
+            'FROM (SELECT line, max(upper(slot)) OVER ('
+            '  PARTITION BY venue_ref ORDER BY lower(slot), line '
+            '  ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) AS busy_until '
+            '  FROM import_staging WHERE error IS NULL'
+            ') o WHERE s.line = o.line AND o.busy_until > lower(s.slot)'
+        ],
+        # The INSERT bypasses the ORM events that keep the show counters.
+        finish=[
+            bulk_adjust_sql('Venue', 's.venue_ref', 'pg_temp.fyyur_try_timestamp(s.start_time)',
+                            'import_staging', 's.error IS NULL'),
+            bulk_adjust_sql('Artist', 's.artist_ref', 'pg_temp.fyyur_try_timestamp(s.start_time)',
+                            'import_staging', 's.error IS NULL')
+        ]
+    )
+}
+
+
+#  Validation rules
+#  ----------------------------------------------------------------
+
+def _postgres_regex(pattern):
+    # Postgres regular expressions have no named groups.
+    return re.sub(r'\(\?P<\w+>', '(', pattern)
+
+
+def form_rules(form_class, fields):
+    # Translates the validators declared on a form into SQL predicates over
+    # the staging table, in declaration order, together with their parameters.
+    rules = []
+    params = {}
+    for field in fields:
+        unbound = getattr(form_class, field, None)
+        if unbound is None:
+            continue
+        for validator in unbound.kwargs.get('validators', []):
+            if isinstance(validator, DataRequired):
+                rules.append(("coalesce(trim({}), '') <> ''".format(field),
+                              field + ' This field is required.'))
+            elif validator is validate_phone:
+                params[field + '_regex'] = US_PHONE_NUM
+                rules.append(("coalesce({}, '') ~ %({}_regex)s".format(field, field),
+                              field + ' Phone number must be 10 digits.'))
+            elif isinstance(validator, URL):
+                params[field + '_regex'] = _postgres_regex(validator.regex.pattern)
+                rules.append(("coalesce({}, '') ~* %({}_regex)s".format(field, field),
+                              field + ' Invalid URL.'))
+
+        choices = unbound.kwargs.get('choices')
+        if choices:
+            params[field + '_choices'] = [value for value, _ in choices]
+            if issubclass(unbound.field_class, SelectMultipleField):
+                predicate = '{} <@ %({}_choices)s::text[]'.format(_genres(field), field)
+            else:
+                predicate = '{} = ANY(%({}_choices)s)'.format(field, field)
+            rules.append((predicate, field + ' Not a valid choice.'))
+
+        if field == 'start_time':
+            rules.append(('pg_temp.fyyur_try_timestamp(start_time) IS NOT NULL',
+                          field + ' Not a valid datetime value.'))
+    return rules, params
+
+
+#  Loading
+#  ----------------------------------------------------------------
+
+def _copy_csv(cursor, stream, fields):
+    header = [name.strip() for name in next(csv.reader([stream.readline()]))]
+    unknown = set(header) - set(fields)
+    if unknown:
+        raise click.ClickException('Unknown columns: {}'.format(', '.join(sorted(unknown))))
+    cursor.copy_expert(
+        'COPY import_staging ({}) FROM STDIN WITH (FORMAT csv)'.format(', '.join(header)),
+        stream)
+
+
+def _copy_ndjson(cursor, stream, fields):
+    # Each line is loaded verbatim as jsonb (quote and delimiter characters
+    # that never occur in JSON keep COPY from interpreting it), then unpacked.
+    cursor.execute('CREATE TEMP TABLE import_raw (doc jsonb) ON COMMIT DROP')
+    cursor.copy_expert(
+        "COPY import_raw (doc) FROM STDIN WITH (FORMAT csv, QUOTE e'\\x01', DELIMITER e'\\x02')",
+        stream)
+    values = []
+    for field in fields:
+        if field == 'genres':
+            values.append("CASE jsonb_typeof(doc->'genres') WHEN 'array' THEN "
+                          "array_to_string(ARRAY(SELECT jsonb_array_elements_text(doc->'genres')), ',') "
+                          "ELSE doc->>'genres' END")
+        else:
+            values.append("doc->>'{}'".format(field))
+    cursor.execute('INSERT INTO import_staging ({}) SELECT {} FROM import_raw'.format(
+        ', '.join(fields), ', '.join(values)))
+
+
+def run_import(kind, stream, fmt):
+    spec = SPECS[kind]
+    rules, params = form_rules(spec.form, spec.fields)
+    params['true_values'] = TRUE_VALUES
+
+    cursor = db.session.connection().connection.cursor()
+    # A bulk load is expected to outlast the web statement_timeout.
+    cursor.execute('SET LOCAL statement_timeout = 0')
+    cursor.execute(
+        'CREATE FUNCTION pg_temp.fyyur_try_timestamp(value text) RETURNS timestamp AS $$ '
+        'BEGIN RETURN value::timestamp; EXCEPTION WHEN others THEN RETURN NULL; END; '
+        '$$ LANGUAGE plpgsql')
+    cursor.execute(
+        'CREATE TEMP TABLE import_staging (line bigserial, {}, error text) ON COMMIT DROP'.format(
+            ', '.join('{} text'.format(field) for field in spec.fields)))
+
+    if fmt == 'csv':
+        _copy_csv(cursor, stream, spec.fields)
+    else:
+        _copy_ndjson(cursor, stream, spec.fields)
+
+    # First failing rule wins, like the first error flashed by the views.
+    checks = ' '.join("WHEN NOT coalesce({}, false) THEN '{}'".format(predicate, message.replace("'", "''"))
+                      for predicate, message in rules)
+    cursor.execute('UPDATE import_staging SET error = CASE {} END'.format(checks), params)
+    for statement in spec.prepare:
+        cursor.execute(statement)
+
+    targets = list(spec.columns)
+    cursor.execute(
+        'INSERT INTO "{}" ({}) SELECT {} FROM import_staging WHERE error IS NULL ORDER BY line'.format(
+            spec.table, ', '.join(targets), ', '.join(spec.columns[target] for target in targets)),
+        params)
+    inserted = cursor.rowcount
+    for statement in spec.finish:
+        cursor.execute(statement)
+
+    cursor.execute('SELECT count(*) FROM import_staging')
+    total = cursor.fetchone()[0]
+    cursor.execute('SELECT line, error FROM import_staging WHERE error IS NOT NULL '
+                   'ORDER BY line LIMIT %s', (SAMPLE_ERRORS,))
+    errors = cursor.fetchall()
+    return total, inserted, errors
+
+
+@click.command('import-data')
+@click.argument('kind', type=click.Choice(sorted(SPECS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              help='Defaults to the file extension.')
+@click.option('--dry-run', is_flag=True, help='Validate and roll back.')
+@with_appcontext
+def import_data(kind, path, fmt, dry_run):
+    """Bulk load venues, artists or shows from a CSV or NDJSON file."""
+    fmt = fmt or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+    start = time.perf_counter()
+    try:
+        with open(path, encoding='utf-8') as stream:
+            total, inserted, errors = run_import(kind, stream, fmt)
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+            page_cache.invalidate(*SPECS[kind].cache_keys)
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        db.session.close()
+    elapsed = time.perf_counter() - start
+
+    for line, error in errors:
+        click.echo('line {}: {}'.format(line, error), err=True)
+    click.echo('{} rows read, {} {}, {} rejected in {:.1f}s ({:.0f} rows/sec)'.format(
+        total, inserted, 'valid' if dry_run else 'imported', total - inserted,
+        elapsed, total / elapsed if elapsed else 0))
@@ -0,0 +1,150 @@
+#----------------------------------------------------------------------------#
+# SQL instrumentation.
+#----------------------------------------------------------------------------#
+
+# Counts and times every statement a request runs, groups them by
+# fingerprint (the statement with parameters and literals blanked out), and
+# warns when a request goes over budget or repeats the same statement often
+# enough to look like an N+1 loop. Totals go out in a Server-Timing header
+# (except on streamed pages, whose queries run after the headers are sent);
+# recent requests can be inspected at /_debug/sql.
+
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from flask import current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_PARAMETER = re.compile(r"%\(\w+\)s|%s|\$\d+|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r'\bIN \((?:\?, )*\?\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(statement):
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    statement = _PARAMETER.sub('?', statement)
+    return _IN_LIST.sub('IN (...)', statement)
+
+
+class RequestStats(object):
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = []
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.statements.append((statement, duration))
+
+    def repeated(self, threshold):
+        counts = Counter(fingerprint(statement) for statement, _ in self.statements)
+        return [(sql, count) for sql, count in counts.most_common() if count >= threshold]
+
+    def slowest(self, limit):
+        return sorted(self.statements, key=lambda item: item[1], reverse=True)[:limit]
+
+
+class SQLInstrumentation(object):
+
+    def __init__(self, app=None):
+        self.recent = deque()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQL_QUERY_BUDGET', 20)
+        app.config.setdefault('SQL_TIME_BUDGET_MS', 250)
+        app.config.setdefault('SQL_REPEAT_THRESHOLD', 5)
+        app.config.setdefault('SQL_SLOWEST', 5)
+        app.config.setdefault('SQL_RECENT_REQUESTS', 50)
+        app.config.setdefault('SQL_DEBUG_ENDPOINT', app.debug)
+        self.recent = deque(maxlen=app.config['SQL_RECENT_REQUESTS'])
+
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+        app.before_request(_start_request)
+        app.after_request(self._finish_request)
+        if app.config['SQL_DEBUG_ENDPOINT']:
+            app.add_url_rule('/_debug/sql', 'debug_sql', self.debug_view)
+        app.extensions['sql_instrumentation'] = self
+
+    def _finish_request(self, response):
+        if response.is_streamed:
+            # The body - and most of the queries, for a streamed listing - is
+            # produced after this hook, so the stats stay in g for the stream
+            # to keep recording into and are checked once it has been sent.
+            # Too late for a Server-Timing header; the budget, N+1 warnings
+            # and /_debug/sql still see them.
+            stats = g.get('sql_stats')
+            if stats is not None:
+                app = current_app._get_current_object()
+                context = (request.method, request.full_path.rstrip('?'), request.path,
+                           request.endpoint, response.status_code)
+                response.call_on_close(lambda: self._account(app, stats, *context))
+            return response
+
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+        response.headers.add('Server-Timing', 'db;dur={:.1f};desc="{} queries"'.format(
+            stats.duration * 1000, stats.count))
+        self._account(current_app, stats, request.method, request.full_path.rstrip('?'),
+                      request.path, request.endpoint, response.status_code)
+        return response
+
+    def _account(self, app, stats, method, full_path, path, endpoint, status):
+        config = app.config
+        duration_ms = stats.duration * 1000
+        repeated = stats.repeated(config['SQL_REPEAT_THRESHOLD'])
+
+        if stats.count > config['SQL_QUERY_BUDGET'] or duration_ms > config['SQL_TIME_BUDGET_MS']:
+            app.logger.warning('%s %s ran %d queries in %.1fms (budget %d / %dms)',
+                               method, path, stats.count, duration_ms,
+                               config['SQL_QUERY_BUDGET'], config['SQL_TIME_BUDGET_MS'])
+        for sql, count in repeated:
+            app.logger.warning('%s %s: possible N+1, %d x %s', method, path, count, sql)
+
+        with self._lock:
+            self.recent.append({
+                "method": method,
+                "path": full_path,
+                "endpoint": endpoint,
+                "status": status,
+                "queries": stats.count,
+                "db_ms": round(duration_ms, 2),
+                "repeated": [{"count": count, "sql": sql} for sql, count in repeated],
+                "slowest": [{"ms": round(duration * 1000, 2), "sql": fingerprint(statement)}
+                            for statement, duration in stats.slowest(config['SQL_SLOWEST'])]
+            })
+
+    def debug_view(self):
+        with self._lock:
+            return jsonify(list(reversed(self.recent)))
+
+
+def _start_request():
+    g.sql_stats = RequestStats()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info['query_start_time'].pop()
+    if has_request_context() and 'sql_stats' in g:
+        g.sql_stats.record(statement, time.perf_counter() - start)
+
+
+def _handle_error(context):
+    starts = context.connection.info.get('query_start_time') if context.connection else None
+    if starts:
+        starts.pop()
@@ -0,0 +1,89 @@
+#----------------------------------------------------------------------------#
+# Command line entry point.
+#----------------------------------------------------------------------------#
+
+#   export FLASK_APP=manage
+#   flask db upgrade
+#   flask import-data venues venues.csv
+#   flask build-assets
+#   flask import-profile
+#
+# Kept apart from wsgi.py so web workers never import what only the
+# commands need (alembic, the bulk importer).
+
+import os
+import re
+import subprocess
+import sys
+
+# Commands run as the worker role (config.DB_STATEMENT_TIMEOUTS), unless told
+# otherwise; set before config.py is imported.
+os.environ.setdefault('APP_ROLE', 'worker')
+
+import click
+from flask_migrate import Migrate
+
+import assets
+import counters
+import importer
+import templating
+from app import create_app
+from models import db
+
+app = create_app()
+migrate = Migrate(app, db)
+
+app.cli.add_command(importer.import_data)
+app.cli.add_command(counters.rollover_show_counts)
+app.cli.add_command(counters.recount_show_counts)
+
+@app.cli.command('compile-templates')
+def compile_templates():
+    """Compile every template into JINJA_BYTECODE_CACHE_DIR."""
+    if not app.config['JINJA_BYTECODE_CACHE_DIR']:
+        raise click.UsageError('JINJA_BYTECODE_CACHE_DIR is not set.')
+    names = templating.compile_templates(app)
+    click.echo('{} templates compiled into {}'.format(
+        len(names), app.config['JINJA_BYTECODE_CACHE_DIR']))
+
+
+@app.cli.command('build-assets')
+def build_assets():
+    """Bundle, minify and pre-compress the CSS and JS into static/dist."""
+    folder = os.path.join(app.static_folder, assets.DIST)
+    for name, filename in sorted(assets.build(app).items()):
+        sizes = [os.path.getsize(os.path.join(folder, filename + suffix))
+                 for suffix in ('', '.gz', '.br')]
+        click.echo('{:<10} {:<26} {:>8} {:>8} gz {:>8} br'.format(name, filename, *sizes))
+
+
+_IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| *(\S+)$')
+
+
+@app.cli.command('import-profile')
+@click.option('--module', default='wsgi', show_default=True, help='Module to import.')
+@click.option('--limit', default=20, show_default=True, help='Rows per table.')
+def import_profile(module, limit):
+    """Show which imports make up the start-up time of a fresh process."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    rows = []
+    for line in result.stderr.decode().splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match:
+            own, cumulative, name = match.groups()
+            rows.append((name, int(own), int(cumulative)))
+    total = max(cumulative for _, _, cumulative in rows)
+
+    packages = {}
+    for name, own, _ in rows:
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + own
+
+    click.echo('import {}: {:.1f}ms, {} modules\n'.format(module, total / 1000, len(rows)))
+    click.echo('{:<48} {:>10} {:>6}'.format('package', 'ms', '%'))
+    for package, own in sorted(packages.items(), key=lambda item: -item[1])[:limit]:
+        click.echo('{:<48} {:>10.1f} {:>6.1f}'.format(package, own / 1000, 100.0 * own / total))
+    click.echo('\n{:<48} {:>10}'.format('module', 'ms'))
+    for name, own, _ in sorted(rows, key=lambda row: -row[1])[:limit]:
+        click.echo('{:<48} {:>10.1f}'.format(name, own / 1000))
@@ -0,0 +1,113 @@
+#----------------------------------------------------------------------------#
+# Prometheus metrics.
+#----------------------------------------------------------------------------#
+
+# Served at /metrics. Under gunicorn, set PROMETHEUS_MULTIPROC_DIR to an
+# empty directory shared by the workers: every process writes its samples to
+# memory-mapped files there and the scrape aggregates them, whichever worker
+# answers it. Dead workers are cleaned up by the child_exit hook in
+# gunicorn.conf.py, which also sets the variable.
+
+import os
+import time
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUESTS = Counter(
+    'fyyur_http_requests_total', 'HTTP requests served.',
+    ['endpoint', 'method', 'status'])
+LATENCY = Histogram(
+    'fyyur_http_request_duration_seconds', 'Time spent producing a response.',
+    ['endpoint'], buckets=LATENCY_BUCKETS)
+IN_FLIGHT = Gauge(
+    'fyyur_http_requests_in_flight', 'Requests currently being handled.',
+    multiprocess_mode='livesum')
+
+POOL_WAIT = Histogram(
+    'fyyur_db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection.',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+POOL_TIMEOUTS = Counter(
+    'fyyur_db_pool_checkout_timeouts_total', 'Checkouts that gave up after DB_POOL_TIMEOUT.')
+POOL_CHECKED_OUT = Gauge(
+    'fyyur_db_pool_checked_out', 'Connections currently checked out of the pool.',
+    multiprocess_mode='livesum')
+
+CACHE_LOOKUPS = Counter(
+    'fyyur_page_cache_lookups_total', 'Page cache lookups; hit ratio is hit / (hit + miss).',
+    ['result'])
+FRAGMENT_LOOKUPS = Counter(
+    'fyyur_fragment_cache_lookups_total', 'Fragment cache lookups, one per cached tile or row.',
+    ['result'])
+
+
+class Metrics(object):
+
+    def __init__(self, app=None, db=None, page_cache=None, pool_stats=None, fragment_cache=None):
+        self.db = db
+        if app is not None:
+            self.init_app(app, db, page_cache, pool_stats, fragment_cache)
+
+    def init_app(self, app, db=None, page_cache=None, pool_stats=None, fragment_cache=None):
+        self.db = db
+        # The collectors are process-wide, so hook each source only once
+        # however many apps are created.
+        if page_cache is not None and self._observe_lookup not in page_cache.listeners:
+            page_cache.listeners.append(self._observe_lookup)
+        if fragment_cache is not None and self._observe_fragment not in fragment_cache.listeners:
+            fragment_cache.listeners.append(self._observe_fragment)
+        if pool_stats is not None and self._observe_checkout not in pool_stats.listeners:
+            pool_stats.listeners.append(self._observe_checkout)
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+    def _observe_lookup(self, hit):
+        CACHE_LOOKUPS.labels('hit' if hit else 'miss').inc()
+
+    def _observe_fragment(self, hit):
+        FRAGMENT_LOOKUPS.labels('hit' if hit else 'miss').inc()
+
+    def _observe_checkout(self, seconds, timed_out):
+        POOL_WAIT.observe(seconds)
+        if timed_out:
+            POOL_TIMEOUTS.inc()
+
+    def _start_request(self):
+        g.metrics_start = time.perf_counter()
+        IN_FLIGHT.inc()
+
+    def _finish_request(self, response):
+        start = g.get('metrics_start')
+        if start is not None:
+            endpoint = request.endpoint or 'unmatched'
+            LATENCY.labels(endpoint).observe(time.perf_counter() - start)
+            REQUESTS.labels(endpoint, request.method, response.status_code).inc()
+        return response
+
+    def _teardown_request(self, exc):
+        if g.pop('metrics_start', None) is not None:
+            IN_FLIGHT.dec()
+        if self.db is not None and self.db.engine.pool is not None:
+            POOL_CHECKED_OUT.set(self.db.engine.pool.checkedout())
+
+    def metrics_view(self):
+        if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -73,6 +73,8 @@ def run_migrations_online():
     connectable = current_app.extensions['migrate'].db.engine
 
     with connectable.connect() as connection:
+        # Index builds and backfills outlast any web statement_timeout.
+        connection.exec_driver_sql('SET statement_timeout = 0')
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
@@ -0,0 +1,55 @@
+"""show end times and no double-booked venues
+
+Revision ID: a7d3e9c1f2b6
+Revises: e5a19c3b7d42
+Create Date: 2026-10-17 22:40:13.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3e9c1f2b6'
+down_revision = 'e5a19c3b7d42'
+branch_labels = None
+depends_on = None
+
+# Shows listed before end times existed are taken to last this long, the
+# same default models.Show applies.
+DEFAULT_LENGTH = "interval '3 hours'"
+
+OVERLAPS = (
+    'SELECT a.venue_id, a.id, b.id FROM "Show" a JOIN "Show" b '
+    'ON a.venue_id = b.venue_id AND a.id < b.id '
+    'AND tsrange(a.start_time, a.end_time) && tsrange(b.start_time, b.end_time) '
+    'ORDER BY 1, 2, 3 LIMIT 10')
+
+
+def upgrade():
+    # The exclusion constraint mixes = on an integer with && on a range in
+    # one GiST index, which needs btree_gist's integer operator class.
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    op.execute('UPDATE "Show" SET end_time = start_time + {}'.format(DEFAULT_LENGTH))
+    op.alter_column('Show', 'end_time', nullable=False)
+    op.create_check_constraint('ck_Show_end_after_start', 'Show', 'end_time > start_time')
+
+    # Fail with the offending rows rather than a bare constraint error; they
+    # have to be rescheduled or removed by hand.
+    clashes = op.get_bind().execute(sa.text(OVERLAPS)).fetchall()
+    if clashes:
+        raise RuntimeError(
+            'Shows overlap at the same venue; fix them and upgrade again. '
+            '(venue, show, show): {}'.format(', '.join(str(tuple(row)) for row in clashes)))
+
+    # Its GiST index also serves the overlap lookups (availability,
+    # scheduling conflicts). It takes a SHARE lock on "Show" while it builds.
+    op.execute('ALTER TABLE "Show" ADD CONSTRAINT "ex_Show_venue_slot" '
+               'EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&)')
+
+
+def downgrade():
+    op.drop_constraint('ex_Show_venue_slot', 'Show')
+    op.drop_constraint('ck_Show_end_after_start', 'Show')
+    op.drop_column('Show', 'end_time')
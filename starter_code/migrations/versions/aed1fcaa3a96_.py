@@ -0,0 +1,27 @@
+"""updated_at columns
+
+Revision ID: aed1fcaa3a96
+Revises: f86324e6af32
+Create Date: 2026-10-17 11:02:19.552907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'aed1fcaa3a96'
+down_revision = 'f86324e6af32'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist', 'Show'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                       server_default=sa.text("(now() at time zone 'utc')")))
+
+
+def downgrade():
+    for table in ('Show', 'Artist', 'Venue'):
+        op.drop_column(table, 'updated_at')
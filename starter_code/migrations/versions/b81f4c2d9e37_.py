@@ -0,0 +1,40 @@
+"""genre and area indexes for browsing
+
+Revision ID: b81f4c2d9e37
+Revises: a7d3e9c1f2b6
+Create Date: 2026-10-17 23:05:51.402876
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b81f4c2d9e37'
+down_revision = 'a7d3e9c1f2b6'
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, using)
+INDEXES = (
+    # GIN indexes backing the genres @> ARRAY[...] filters in
+    # queries._browse_filter().
+    ('ix_Venue_genres', 'Venue', ['genres'], 'gin'),
+    ('ix_Artist_genres', 'Artist', ['genres'], 'gin'),
+    # Venues already have ix_Venue_area for the venue listing.
+    ('ix_Artist_area', 'Artist', ['state', 'city', 'id'], None),
+)
+
+
+def upgrade():
+    # Built concurrently, as in c4e2b7d91f05: an INVALID index left by a
+    # failed build has to be dropped before running the upgrade again.
+    with op.get_context().autocommit_block():
+        for name, table, columns, using in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True,
+                            postgresql_using=using)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, using in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,44 @@
+"""show and venue area indexes
+
+Revision ID: c4e2b7d91f05
+Revises: aed1fcaa3a96
+Create Date: 2026-10-17 14:20:07.381256
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e2b7d91f05'
+down_revision = 'aed1fcaa3a96'
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, include)
+INDEXES = (
+    # Detail pages: one venue's / artist's shows, in start_time order.
+    ('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], None),
+    ('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], None),
+    # /shows keyset pages, and the "upcoming" filter as a range on the same
+    # index. A partial WHERE start_time > now() index isn't possible: index
+    # predicates must be immutable.
+    ('ix_Show_start_time_id', 'Show', ['start_time', 'id'], None),
+    # /venues area directory, readable as an index-only scan.
+    ('ix_Venue_area', 'Venue', ['state', 'city', 'id'], ['name']),
+)
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY doesn't block writes but can't run inside a
+    # transaction. If it fails it leaves an INVALID index behind; drop it and
+    # run the upgrade again.
+    with op.get_context().autocommit_block():
+        for name, table, columns, include in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True,
+                            postgresql_include=include or [])
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, include in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,67 @@
+"""show counters on venues and artists
+
+Revision ID: e5a19c3b7d42
+Revises: c4e2b7d91f05
+Create Date: 2026-10-17 15:41:52.907113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a19c3b7d42'
+down_revision = 'c4e2b7d91f05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), nullable=False,
+                                       server_default='0'))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), nullable=False,
+                                       server_default='0'))
+    op.create_table('ShowCountWatermark',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('rolled_over_at', sa.DateTime(), nullable=False),
+                    sa.PrimaryKeyConstraint('id'))
+    # UTC, like Show.start_time and every datetime.utcnow() counters.py
+    # compares with it.
+    op.execute('INSERT INTO "ShowCountWatermark" (id, rolled_over_at) '
+               "VALUES (1, now() at time zone 'utc')")
+
+    # Backfill, as counters.recount() does.
+    for table, key in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.execute(
+            'UPDATE "{table}" t SET upcoming_shows_count = c.upcoming, past_shows_count = c.past '
+            'FROM (SELECT {key} AS id, '
+            'count(*) FILTER (WHERE start_time > w.rolled_over_at) AS upcoming, '
+            'count(*) FILTER (WHERE start_time <= w.rolled_over_at) AS past '
+            'FROM "Show", "ShowCountWatermark" w GROUP BY {key}) c '
+            'WHERE t.id = c.id'.format(table=table, key=key))
+
+    with op.get_context().autocommit_block():
+        # /artists?sort=upcoming pages through this index.
+        op.create_index('ix_Artist_upcoming_shows_count', 'Artist',
+                        [sa.text('upcoming_shows_count DESC'), 'id'],
+                        postgresql_concurrently=True)
+        # Rebuilt to cover the count shown on /venues, keeping that page an
+        # index-only scan.
+        op.drop_index('ix_Venue_area', table_name='Venue', postgresql_concurrently=True)
+        op.create_index('ix_Venue_area', 'Venue', ['state', 'city', 'id'],
+                        postgresql_include=['name', 'upcoming_shows_count'],
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_Venue_area', table_name='Venue', postgresql_concurrently=True)
+        op.create_index('ix_Venue_area', 'Venue', ['state', 'city', 'id'],
+                        postgresql_include=['name'], postgresql_concurrently=True)
+        op.drop_index('ix_Artist_upcoming_shows_count', table_name='Artist',
+                      postgresql_concurrently=True)
+    op.drop_table('ShowCountWatermark')
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -0,0 +1,35 @@
+"""trigram search indexes
+
+Revision ID: f86324e6af32
+Revises: f088d099e466
+Create Date: 2026-10-17 09:12:40.118204
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f86324e6af32'
+down_revision = 'f088d099e466'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_Venue_name_trgm', 'Venue', ['name'], postgresql_using='gin',
+                    postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_Artist_name_trgm', 'Artist', ['name'], postgresql_using='gin',
+                    postgresql_ops={'name': 'gin_trgm_ops'})
+    # Expression indexes backing the "city, state" match in queries.search_query().
+    op.execute('CREATE INDEX "ix_Venue_area_trgm" ON "Venue" '
+               'USING gin ((city || \', \' || state) gin_trgm_ops)')
+    op.execute('CREATE INDEX "ix_Artist_area_trgm" ON "Artist" '
+               'USING gin ((city || \', \' || state) gin_trgm_ops)')
+
+
+def downgrade():
+    op.drop_index('ix_Artist_area_trgm', table_name='Artist')
+    op.drop_index('ix_Venue_area_trgm', table_name='Venue')
+    op.drop_index('ix_Artist_name_trgm', table_name='Artist')
+    op.drop_index('ix_Venue_name_trgm', table_name='Venue')
@@ -2,29 +2,51 @@
 # Models.
 #----------------------------------------------------------------------------#
 
-from flask import Flask
-from flask_migrate import Migrate
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
+
+from cache import PageCache
+from compression import Compress
+from fragments import FragmentCache
+from routing import RoutingSQLAlchemy
+from instrumentation import SQLInstrumentation
+from metrics import Metrics
 
 
 #----------------------------------------------------------------------------#
-# App Config.
+# Extensions.
 #----------------------------------------------------------------------------#
 
+# Bound to an application by app.create_app(); nothing here connects.
+# Flask-Migrate (and alembic with it) is only set up by manage.py.
+
+moment = Moment()
+db = RoutingSQLAlchemy()
+page_cache = PageCache()
+fragment_cache = FragmentCache()
+sql_instrumentation = SQLInstrumentation()
+metrics = Metrics()
+compress = Compress()
 
-# TODO: connect to a local postgresql database
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+def _area_expression():
+    # "city, state", as matched by queries.search_query().
+    return (db.column('city', db.String) + db.literal_column("', '")
+            + db.column('state', db.String)).label('area')
 
 
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Venue_area_trgm', _area_expression(), postgresql_using='gin',
+                 postgresql_ops={'area': 'gin_trgm_ops'}),
+        db.Index('ix_Venue_area', 'state', 'city', 'id',
+                 postgresql_include=['name', 'upcoming_shows_count']),
+        db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -38,6 +60,12 @@ class Venue(db.Model):
     facebook_link = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean, nullable=False, default=False)
     seeking_description = db.Column(db.String(1000))
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow,
+                           server_default=db.text("(now() at time zone 'utc')"))
+    # Maintained by counters.py; see there for how "upcoming" is defined.
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     shows = db.relationship('Show', backref="venue", lazy=True)
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
@@ -45,6 +73,15 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Artist_area_trgm', _area_expression(), postgresql_using='gin',
+                 postgresql_ops={'area': 'gin_trgm_ops'}),
+        db.Index('ix_Artist_upcoming_shows_count', db.desc('upcoming_shows_count'), 'id'),
+        db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_Artist_area', 'state', 'city', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -57,6 +94,11 @@ class Artist(db.Model):
     facebook_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean, nullable=False, default=False)
     seeking_description = db.Column(db.String(1000))
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow,
+                           server_default=db.text("(now() at time zone 'utc')"))
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     shows = db.relationship('Show', backref="artist", lazy=True)
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
@@ -64,11 +106,41 @@ class Artist(db.Model):
 # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
 
 
+# How long a show lasts when no end time is given.
+DEFAULT_SHOW_LENGTH = timedelta(hours=3)
+
+
+def _default_end_time(context):
+    return context.get_current_parameters()['start_time'] + DEFAULT_SHOW_LENGTH
+
+
 class Show(db.Model):
     __tablename__ = 'Show'
+    __table_args__ = (
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+        db.CheckConstraint('end_time > start_time', name='ck_Show_end_after_start'),
+        # A venue hosts one show at a time. Needs btree_gist; the index also
+        # answers "what is on at this venue between X and Y".
+        ExcludeConstraint(('venue_id', '='), (db.text('tsrange(start_time, end_time)'), '&&'),
+                          using='gist', name='ex_Show_venue_slot'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     artist_id = db.Column(db.Integer, db.ForeignKey(
         'Artist.id'), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False,
                            default=datetime.utcnow)
+    end_time = db.Column(db.DateTime, nullable=False, default=_default_end_time)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow,
+                           server_default=db.text("(now() at time zone 'utc')"))
+
+
+class ShowCountWatermark(db.Model):
+    # Single row: shows starting after rolled_over_at are counted as upcoming.
+    __tablename__ = 'ShowCountWatermark'
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_over_at = db.Column(db.DateTime, nullable=False)
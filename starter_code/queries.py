@@ -0,0 +1,466 @@
+#----------------------------------------------------------------------------#
+# Queries.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from sqlalchemy import String, and_, cast, func, literal, literal_column, or_, true, tuple_
+
+from models import db, page_cache, Venue, Artist, Show
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+def venue_area_query():
+    # A single ordered scan of ix_Venue_area: venues of the same city/state
+    # come back next to each other, so the areas can be grouped without a
+    # query per area.
+    return db.session.query(Venue.id, Venue.name, Venue.city, Venue.state,
+                            Venue.upcoming_shows_count) \
+        .order_by(Venue.state, Venue.city, Venue.id)
+
+
+def venue_areas():
+    rows = venue_area_query().all()
+
+    areas = []
+    for (state, city), venues in groupby(rows, key=lambda row: (row.state, row.city)):
+        # Busiest venues first; an area only holds a handful.
+        venues = sorted(venues, key=lambda venue: (-venue.upcoming_shows_count, venue.id))
+        areas.append({
+            "city": city,
+            "state": state,
+            "venues": [{"id": venue.id, "name": venue.name,
+                        "num_upcoming_shows": venue.upcoming_shows_count} for venue in venues]
+        })
+    return areas
+
+
+#  Artists
+#  ----------------------------------------------------------------
+
+def _artist_list_query():
+    return db.session.query(Artist.id, Artist.name, Artist.upcoming_shows_count,
+                            Artist.updated_at)
+
+
+# The *_query builders return the exact statement the function of the same
+# name runs, so tests/test_query_plans.py can EXPLAIN it.
+
+def artist_rows_query(limit, after=None):
+    query = _artist_list_query().order_by(Artist.id)
+    if after:
+        query = query.filter(Artist.id > after)
+    return query.limit(limit + 1)
+
+
+def artist_rows(limit, after=None):
+    rows = artist_rows_query(limit, after).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def encode_count_cursor(count, artist_id):
+    return '{}_{}'.format(count, artist_id)
+
+
+def decode_count_cursor(cursor):
+    count, _, artist_id = cursor.partition('_')
+    return int(count), int(artist_id)
+
+
+def busiest_artist_rows_query(limit, after=None):
+    # Most upcoming shows first, keyset-paginated on
+    # ix_Artist_upcoming_shows_count (upcoming_shows_count DESC, id).
+    query = _artist_list_query().order_by(Artist.upcoming_shows_count.desc(), Artist.id)
+    if after:
+        count, artist_id = after
+        query = query.filter(or_(
+            Artist.upcoming_shows_count < count,
+            and_(Artist.upcoming_shows_count == count, Artist.id > artist_id)))
+    return query.limit(limit + 1)
+
+
+def busiest_artist_rows(limit, after=None):
+    rows = busiest_artist_rows_query(limit, after).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_count_cursor(rows[-1].upcoming_shows_count, rows[-1].id)
+    return rows, next_cursor
+
+
+def stream_artist_rows(batch_size=1000):
+    # Server-side cursor: rows are fetched batch_size at a time while the
+    # response is being written, so memory stays flat however many artists
+    # there are.
+    return _artist_list_query() \
+        .order_by(Artist.id) \
+        .execution_options(stream_results=True) \
+        .yield_per(batch_size)
+
+
+#  Search
+#  ----------------------------------------------------------------
+
+def _like_pattern(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return '%' + escaped + '%'
+
+
+def search_query(entity, term, page, per_page):
+    # Both predicates are served by the pg_trgm GIN indexes created in
+    # migration f86324e6af32; rows are ranked by trigram similarity.
+    pattern = _like_pattern(term)
+    area = entity.city + literal_column("', '") + entity.state
+    rank = func.greatest(func.similarity(entity.name, term), func.similarity(area, term))
+    return db.session.query(
+        entity.id,
+        entity.name,
+        func.count().over().label('total')
+    ).filter(or_(entity.name.ilike(pattern, escape='\\'), area.ilike(pattern, escape='\\'))) \
+     .order_by(rank.desc(), entity.id) \
+     .limit(per_page).offset((page - 1) * per_page)
+
+
+def search(entity, term, page, per_page):
+    rows = search_query(entity, term, page, per_page).all()
+    return {
+        "count": rows[0].total if rows else 0,
+        "data": rows,
+        "page": page,
+        "has_next": bool(rows) and rows[0].total > page * per_page
+    }
+
+
+#  Browse
+#  ----------------------------------------------------------------
+
+# Filters are a dict of genre (a list; a row must have all of them), state,
+# city and seeking (seeking_talent for venues, seeking_venue for artists),
+# as read from the query string by app.browse_filters().
+
+FACET_LIMIT = 50
+
+
+def _seeking(entity):
+    return Venue.seeking_talent if entity is Venue else Artist.seeking_venue
+
+
+def _browse_filter(query, entity, filters):
+    if filters.get('genre'):
+        # Array containment, answered by the ix_<entity>_genres GIN index.
+        # The cast keeps both sides varchar[]: compared with a text[] the
+        # column would be cast instead and the index left unused.
+        query = query.filter(entity.genres.op('@>')(cast(filters['genre'], entity.genres.type)))
+    if filters.get('state'):
+        query = query.filter(entity.state == filters['state'])
+    if filters.get('city'):
+        query = query.filter(entity.city == filters['city'])
+    if filters.get('seeking'):
+        query = query.filter(_seeking(entity))
+    return query
+
+
+def browse_query(entity, filters, limit, after=None):
+    query = _browse_filter(db.session.query(entity.id, entity.name, entity.city, entity.state,
+                                            entity.genres, entity.upcoming_shows_count),
+                           entity, filters)
+    if after:
+        query = query.filter(entity.id > after)
+    return query.order_by(entity.id).limit(limit + 1)
+
+
+def browse(entity, filters, limit, after=None):
+    rows = browse_query(entity, filters, limit, after).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def facet_counts_query(entity, filters):
+    # How many of the matching rows fall under each genre, state and (once a
+    # state is picked) city, and how many are seeking: the matches are
+    # collected once and every facet is grouped from them, in one statement.
+    matches = _browse_filter(
+        db.session.query(entity.genres, entity.state, entity.city, _seeking(entity).label('seeking')),
+        entity, filters).cte('matches')
+    genre = func.unnest(matches.c.genres).table_valued('value').render_derived(name='genre')
+    count = func.count().label('rows')
+
+    facets = [
+        db.session.query(literal('genre').label('facet'), genre.c.value.label('value'), count)
+            .select_from(matches).join(genre, true()).group_by(genre.c.value),
+        db.session.query(literal('state'), matches.c.state.label('value'), count).group_by(matches.c.state),
+        db.session.query(literal('seeking'), cast(matches.c.seeking, String).label('value'), count)
+            .group_by(matches.c.seeking),
+    ]
+    if filters.get('state'):
+        facets.append(db.session.query(literal('city'), matches.c.city.label('value'), count)
+                      .group_by(matches.c.city))
+    return facets[0].union_all(*facets[1:])
+
+
+def facet_counts(entity, filters):
+    grouped = {'genre': [], 'state': [], 'city': [], 'seeking': []}
+    for row in facet_counts_query(entity, filters):
+        grouped[row.facet].append({"value": row.value, "count": row.rows})
+    for facet in ('genre', 'state', 'city'):
+        grouped[facet].sort(key=lambda entry: (-entry["count"], entry["value"]))
+    return {
+        "total": sum(entry["count"] for entry in grouped['state']),
+        "genres": grouped['genre'][:FACET_LIMIT],
+        "states": grouped['state'][:FACET_LIMIT],
+        "cities": grouped['city'][:FACET_LIMIT],
+        "seeking": sum(entry["count"] for entry in grouped['seeking'] if entry["value"] == 'true')
+    }
+
+
+def facet_summary_key(entity):
+    return 'facets:' + entity.__tablename__
+
+
+def facet_summary(entity, filters):
+    # The unfiltered summary, which every browse starts from, goes through
+    # the page cache; the venue/artist write handlers invalidate it. Narrower
+    # filters are cheap enough to count on every request.
+    if any(filters.values()):
+        return facet_counts(entity, filters)
+    key = facet_summary_key(entity)
+    summary = page_cache.get(key)
+    if summary is None:
+        summary = facet_counts(entity, filters)
+        page_cache.set(key, summary)
+    return summary
+
+
+#  Detail pages
+#  ----------------------------------------------------------------
+
+VENUE_DETAIL_FIELDS = (
+    'id', 'name', 'genres', 'address', 'city', 'state', 'phone', 'website',
+    'facebook_link', 'seeking_talent', 'seeking_description', 'image_link'
+)
+
+ARTIST_DETAIL_FIELDS = (
+    'id', 'name', 'genres', 'city', 'state', 'phone', 'website',
+    'facebook_link', 'seeking_venue', 'seeking_description', 'image_link'
+)
+
+
+def _detail_query(entity, entity_id, fields, key, counterpart, counterpart_key):
+    # The entity, its shows and the other side of each show come back in one
+    # statement. Every row carries the entity columns; the past/upcoming split
+    # and both counts are computed by Postgres against a single "now".
+    entity_fk = getattr(Show, key + '_id')
+    counterpart_fk = getattr(Show, counterpart_key + '_id')
+    upcoming = Show.start_time > datetime.utcnow()
+
+    return db.session.query(
+        *[getattr(entity, field) for field in fields],
+        Show.start_time,
+        counterpart.id.label('counterpart_id'),
+        counterpart.name.label('counterpart_name'),
+        counterpart.image_link.label('counterpart_image_link'),
+        upcoming.label('upcoming'),
+        func.count(Show.id).filter(upcoming).over().label('upcoming_shows_count'),
+        func.count(Show.id).filter(~upcoming).over().label('past_shows_count')
+    ).select_from(entity) \
+     .outerjoin(Show, entity_fk == entity.id) \
+     .outerjoin(counterpart, counterpart_fk == counterpart.id) \
+     .filter(entity.id == entity_id) \
+     .order_by(Show.start_time)
+
+
+def _detail(entity, entity_id, fields, key, counterpart, counterpart_key):
+    rows = _detail_query(entity, entity_id, fields, key, counterpart, counterpart_key).all()
+    if not rows:
+        return None
+
+    data = {field: getattr(rows[0], field) for field in fields}
+    data["past_shows"] = []
+    data["upcoming_shows"] = []
+    data["past_shows_count"] = rows[0].past_shows_count
+    data["upcoming_shows_count"] = rows[0].upcoming_shows_count
+
+    for row in rows:
+        if row.start_time is None:
+            continue
+        show = {
+            key + "_id": entity_id,
+            counterpart_key + "_id": row.counterpart_id,
+            counterpart_key + "_name": row.counterpart_name,
+            counterpart_key + "_image_link": row.counterpart_image_link,
+            "start_time": row.start_time
+        }
+        data["upcoming_shows" if row.upcoming else "past_shows"].append(show)
+    return data
+
+
+def _detail_version_query(entity, entity_id, key, counterpart, counterpart_key):
+    # Everything a detail page depends on, without loading it: the newest
+    # updated_at across the entity, its shows and their counterparts, the most
+    # recent show to have moved into the past, and the show counts.
+    entity_fk = getattr(Show, key + '_id')
+    counterpart_fk = getattr(Show, counterpart_key + '_id')
+    upcoming = Show.start_time > datetime.utcnow()
+    return db.session.query(
+        func.greatest(
+            entity.updated_at,
+            func.max(Show.updated_at),
+            func.max(counterpart.updated_at),
+            func.max(Show.start_time).filter(~upcoming)
+        ).label('last_modified'),
+        func.count(Show.id).label('shows_count'),
+        func.count(Show.id).filter(upcoming).label('upcoming_shows_count')
+    ).select_from(entity) \
+     .outerjoin(Show, entity_fk == entity.id) \
+     .outerjoin(counterpart, counterpart_fk == counterpart.id) \
+     .filter(entity.id == entity_id) \
+     .group_by(entity.id)
+
+
+def venue_detail_query(venue_id):
+    return _detail_query(Venue, venue_id, VENUE_DETAIL_FIELDS, 'venue', Artist, 'artist')
+
+
+def venue_detail(venue_id):
+    return _detail(Venue, venue_id, VENUE_DETAIL_FIELDS, 'venue', Artist, 'artist')
+
+
+def venue_version_query(venue_id):
+    return _detail_version_query(Venue, venue_id, 'venue', Artist, 'artist')
+
+
+def venue_version(venue_id):
+    return venue_version_query(venue_id).first()
+
+
+def artist_detail_query(artist_id):
+    return _detail_query(Artist, artist_id, ARTIST_DETAIL_FIELDS, 'artist', Venue, 'venue')
+
+
+def artist_detail(artist_id):
+    return _detail(Artist, artist_id, ARTIST_DETAIL_FIELDS, 'artist', Venue, 'venue')
+
+
+def artist_version_query(artist_id):
+    return _detail_version_query(Artist, artist_id, 'artist', Venue, 'venue')
+
+
+def artist_version(artist_id):
+    return artist_version_query(artist_id).first()
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+def encode_show_cursor(start_time, show_id):
+    return '{}_{}'.format(start_time.isoformat(), show_id)
+
+
+def decode_show_cursor(cursor):
+    start_time, _, show_id = cursor.rpartition('_')
+    return datetime.fromisoformat(start_time), int(show_id)
+
+
+def _show_tile_query():
+    return db.session.query(
+        Show.id,
+        Show.start_time,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Show.end_time,
+        # Tiles show all three rows; an edit to any of them changes the tile.
+        func.greatest(Show.updated_at, Venue.updated_at, Artist.updated_at).label('version')
+    ).join(Venue, Show.venue_id == Venue.id) \
+     .join(Artist, Show.artist_id == Artist.id)
+
+
+def show_tiles_query(limit, after=None, upcoming=False):
+    # Keyset pagination on (start_time, id): each page is a range scan of
+    # ix_Show_start_time_id starting at the cursor instead of an OFFSET that
+    # re-reads earlier rows.
+    query = _show_tile_query()
+    if upcoming:
+        query = query.filter(Show.start_time > datetime.utcnow())
+    if after:
+        query = query.filter(tuple_(Show.start_time, Show.id) > tuple_(*after))
+    # One extra row tells us whether there is a next page without a COUNT.
+    return query.order_by(Show.start_time, Show.id).limit(limit + 1)
+
+
+def show_tiles(limit, after=None, upcoming=False):
+    rows = show_tiles_query(limit, after, upcoming).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_show_cursor(rows[-1].start_time, rows[-1].id)
+    return rows, next_cursor
+
+
+def show_detail(show_id):
+    row = _show_tile_query().filter(Show.id == show_id).first()
+    if row is None:
+        return None
+    return {
+        "id": row.id,
+        "venue_id": row.venue_id,
+        "venue_name": row.venue_name,
+        "artist_id": row.artist_id,
+        "artist_name": row.artist_name,
+        "artist_image_link": row.artist_image_link,
+        "start_time": row.start_time,
+        "end_time": row.end_time
+    }
+
+
+def show_version(show_id):
+    return db.session.query(
+        func.greatest(Show.updated_at, Venue.updated_at, Artist.updated_at).label('last_modified')
+    ).join(Venue, Show.venue_id == Venue.id) \
+     .join(Artist, Show.artist_id == Artist.id) \
+     .filter(Show.id == show_id) \
+     .first()
+
+
+#  Availability
+#  ----------------------------------------------------------------
+
+def venue_busy_query(venue_id, start, end):
+    # The shows overlapping [start, end): a scan of the GiST index behind
+    # ex_Show_venue_slot, whose expression this predicate repeats.
+    slot = func.tsrange(Show.start_time, Show.end_time)
+    return db.session.query(Show.id, Show.start_time, Show.end_time) \
+        .filter(Show.venue_id == venue_id, slot.op('&&')(func.tsrange(start, end))) \
+        .order_by(Show.start_time)
+
+
+def venue_availability(venue_id, start, end, min_length=timedelta(0)):
+    # The venue's shows in the window and the gaps between them at least
+    # min_length long; None if there is no such venue.
+    if db.session.query(Venue.id).filter(Venue.id == venue_id).first() is None:
+        return None
+    shows = venue_busy_query(venue_id, start, end).all()
+
+    free = []
+    cursor = start
+    for show in shows:
+        if show.start_time > cursor and show.start_time - cursor >= min_length:
+            free.append({"start_time": cursor, "end_time": show.start_time})
+        cursor = max(cursor, show.end_time)
+    if end > cursor and end - cursor >= min_length:
+        free.append({"start_time": cursor, "end_time": end})
+
+    return {
+        "venue_id": venue_id,
+        "start_time": start,
+        "end_time": end,
+        "shows": [{"id": show.id, "start_time": show.start_time, "end_time": show.end_time}
+                  for show in shows],
+        "free": free
+    }
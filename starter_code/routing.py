@@ -0,0 +1,164 @@
+#----------------------------------------------------------------------------#
+# Read replica routing.
+#----------------------------------------------------------------------------#
+
+# GET/HEAD requests (and views marked @read_only) read from a replica listed
+# in SQLALCHEMY_REPLICA_URIS, picked round-robin among the healthy ones.
+# Everything else - writes, CLI commands, flushes - uses the primary. After a
+# client writes, its reads stay on the primary for REPLICA_READ_YOUR_WRITES
+# seconds so it never sees a replica that hasn't caught up yet.
+
+import itertools
+import threading
+import time
+from functools import wraps
+
+import sqlalchemy
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import orm
+
+from engine import StatementTimeoutPool, TimedQueuePool
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY_COOKIE = 'primary_until'
+
+
+class ReplicaSet(object):
+
+    def __init__(self, uris, engine_options, retry_after):
+        self.uris = uris
+        self.engine_options = engine_options
+        self.retry_after = retry_after
+        self._engines = None
+        self._down_until = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def engines(self):
+        # Created on first use so that importing the app never connects.
+        if self._engines is None:
+            with self._lock:
+                if self._engines is None:
+                    options = dict(self.engine_options)
+                    if options.get('poolclass') is TimedQueuePool:
+                        # Same pool settings, but kept out of pool_stats.
+                        options['poolclass'] = StatementTimeoutPool
+                    engines = []
+                    for uri in self.uris:
+                        engine = sqlalchemy.create_engine(uri, **options)
+                        sqlalchemy.event.listen(engine, 'handle_error', self._on_error)
+                        engines.append(engine)
+                    self._engines = engines
+        return self._engines
+
+    def _on_error(self, context):
+        if context.is_disconnect or context.connection is None:
+            self.mark_down(context.engine)
+
+    def mark_down(self, engine):
+        self._down_until[engine] = time.monotonic() + self.retry_after
+
+    def _probe(self, engine):
+        try:
+            with engine.connect() as connection:
+                connection.exec_driver_sql('SELECT 1')
+        except sqlalchemy.exc.DBAPIError:
+            self.mark_down(engine)
+            return False
+        self._down_until.pop(engine, None)
+        return True
+
+    def _healthy(self, engine):
+        down_until = self._down_until.get(engine)
+        if down_until is None:
+            return True
+        if down_until > time.monotonic():
+            return False
+        return self._probe(engine)
+
+    def choose(self):
+        engines = self.engines
+        start = next(self._counter)
+        for offset in range(len(engines)):
+            engine = engines[(start + offset) % len(engines)]
+            if self._healthy(engine):
+                return engine
+        return None
+
+    def dispose(self):
+        for engine in self._engines or []:
+            engine.dispose()
+
+    def status(self):
+        now = time.monotonic()
+        return [{"uri": repr(engine.url),
+                 "healthy": self._down_until.get(engine, 0) <= now}
+                for engine in (self._engines or [])]
+
+
+def read_only(view):
+    # For POST views that only read, such as the search forms.
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _reads_from_replica():
+    if not has_request_context():
+        return False
+    if request.method not in READ_METHODS and not g.get('read_only'):
+        return False
+    primary_until = request.cookies.get(PRIMARY_COOKIE, type=float)
+    return not primary_until or primary_until < time.time()
+
+
+class RoutingSession(SignallingSession):
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        replicas = self.app.extensions.get('replicas')
+        if replicas is not None and not self._flushing and _reads_from_replica():
+            # One replica per request, so a page reads a consistent snapshot.
+            if 'replica' not in g:
+                g.replica = replicas.choose()
+            if g.replica is not None:
+                return g.replica
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def dispose(self, app):
+        # Called in each freshly forked worker so that it never reuses a
+        # connection opened by the parent.
+        self.get_engine(app).dispose()
+        replicas = app.extensions.get('replicas')
+        if replicas is not None:
+            replicas.dispose()
+
+    def init_app(self, app):
+        super(RoutingSQLAlchemy, self).init_app(app)
+        app.config.setdefault('SQLALCHEMY_REPLICA_URIS', [])
+        app.config.setdefault('REPLICA_RETRY_AFTER', 30)
+        app.config.setdefault('REPLICA_READ_YOUR_WRITES', 10)
+        if not app.config['SQLALCHEMY_REPLICA_URIS']:
+            return
+
+        app.extensions['replicas'] = ReplicaSet(
+            app.config['SQLALCHEMY_REPLICA_URIS'],
+            app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+            app.config['REPLICA_RETRY_AFTER'])
+
+        @app.after_request
+        def pin_writers_to_primary(response):
+            if request.method not in READ_METHODS and not g.get('read_only'):
+                window = current_app.config['REPLICA_READ_YOUR_WRITES']
+                response.set_cookie(PRIMARY_COOKIE, str(time.time() + window),
+                                    max_age=window, httponly=True)
+            return response
@@ -0,0 +1,121 @@
+#----------------------------------------------------------------------------#
+# Show scheduling.
+#----------------------------------------------------------------------------#
+
+# Books a batch of dates for one artist at one venue: an explicit list, or a
+# recurrence ("every Friday at 8pm until the end of June"). The artist and
+# venue are checked once, and every show is inserted, with the venue and
+# artist counters adjusted, by a single statement.
+#
+# A date whose show would overlap one the venue already has (or an earlier
+# date of the same batch) is a conflict: the other dates are still booked
+# and the conflicting ones reported back. The venue row is locked for the
+# transaction, so two batches for the same venue can't both take a slot;
+# ex_Show_venue_slot backs that up against every other writer.
+
+from datetime import datetime, time
+
+from sqlalchemy import text
+
+from counters import bulk_adjust_sql
+from models import DEFAULT_SHOW_LENGTH
+
+DATE_FORMAT = '%Y-%m-%d %H:%M'
+
+FREQUENCIES = ('daily', 'weekly', 'monthly')
+
+# SQLSTATE exclusion_violation: ex_Show_venue_slot refused an overlapping show.
+EXCLUSION_VIOLATION = '23P01'
+
+
+class SchedulingError(ValueError):
+    pass
+
+
+def is_double_booking(error):
+    # For an IntegrityError raised by an INSERT or UPDATE of "Show".
+    return getattr(error.orig, 'pgcode', None) == EXCLUSION_VIOLATION
+
+
+#  Dates
+#  ----------------------------------------------------------------
+
+def parse_dates(source):
+    # One 'YYYY-MM-DD HH:MM' per line; blank lines are skipped.
+    dates = []
+    for number, line in enumerate(source.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            dates.append(datetime.strptime(line, DATE_FORMAT))
+        except ValueError:
+            raise SchedulingError('Line {}: "{}" is not YYYY-MM-DD HH:MM.'.format(number, line))
+    return dates
+
+
+def recurrence(start, frequency, until, interval=1, limit=None):
+    # Every `interval` days/weeks/months from `start` up to the end of the
+    # day `until`. More than `limit` dates is an error rather than a
+    # truncated schedule.
+    from dateutil import rrule
+
+    freq = {'daily': rrule.DAILY, 'weekly': rrule.WEEKLY, 'monthly': rrule.MONTHLY}[frequency]
+    dates = list(rrule.rrule(freq, dtstart=start, interval=interval,
+                             until=datetime.combine(until, time.max),
+                             count=limit + 1 if limit else None))
+    if limit and len(dates) > limit:
+        raise SchedulingError('That is more than {} shows; pick an earlier end date.'.format(limit))
+    return dates
+
+
+#  Booking
+#  ----------------------------------------------------------------
+
+CHECK = text(
+    'SELECT (SELECT true FROM "Venue" WHERE id = :venue_id FOR UPDATE) AS venue, '
+    '(SELECT true FROM "Artist" WHERE id = :artist_id) AS artist')
+
+INSERT = text(
+    'WITH inserted AS ('
+    '  INSERT INTO "Show" (artist_id, venue_id, start_time, end_time) '
+    '  SELECT :artist_id, :venue_id, t.start_time, t.start_time + CAST(:length AS interval) '
+    '  FROM unnest(CAST(:start_times AS timestamp[])) AS t(start_time) '
+    '  WHERE NOT EXISTS (SELECT 1 FROM "Show" s WHERE s.venue_id = :venue_id '
+    '                    AND tsrange(s.start_time, s.end_time) '
+    '                     && tsrange(t.start_time, t.start_time + CAST(:length AS interval))) '
+    '  RETURNING id, artist_id, venue_id, start_time'
+    '), venues AS ({venues}), artists AS ({artists}) '
+    'SELECT id, start_time FROM inserted ORDER BY start_time'.format(
+        venues=bulk_adjust_sql('Venue', 's.venue_id', 's.start_time', 'inserted'),
+        artists=bulk_adjust_sql('Artist', 's.artist_id', 's.start_time', 'inserted')))
+
+
+def _without_overlaps(start_times, length):
+    # Keeps each date that starts after the previous kept show has ended.
+    kept, clashing = [], []
+    for start_time in sorted(set(start_times)):
+        if kept and start_time < kept[-1] + length:
+            clashing.append(start_time)
+        else:
+            kept.append(start_time)
+    return kept, clashing
+
+
+def schedule_shows(connection, artist_id, venue_id, start_times, length=DEFAULT_SHOW_LENGTH):
+    # Returns the (id, start_time) rows created and the dates that
+    # conflicted; the caller commits.
+    start_times, clashing = _without_overlaps(start_times, length)
+    if not start_times:
+        raise SchedulingError('No dates to schedule.')
+    found = connection.execute(CHECK, {'artist_id': artist_id, 'venue_id': venue_id}).first()
+    if not found.venue:
+        raise SchedulingError('There is no venue with ID {}.'.format(venue_id))
+    if not found.artist:
+        raise SchedulingError('There is no artist with ID {}.'.format(artist_id))
+
+    created = connection.execute(INSERT, {'artist_id': artist_id, 'venue_id': venue_id,
+                                          'start_times': start_times, 'length': length}).fetchall()
+    booked = {row.start_time for row in created}
+    conflicts = clashing + [start_time for start_time in start_times if start_time not in booked]
+    return created, sorted(conflicts)
@@ -0,0 +1,112 @@
+#----------------------------------------------------------------------------#
+# Template compilation.
+#----------------------------------------------------------------------------#
+
+# Compiled templates are written to JINJA_BYTECODE_CACHE_DIR, shared by every
+# worker on the host. `flask compile-templates` fills it at build time, so a
+# fresh process loads bytecode instead of parsing templates. Entries are
+# keyed on the template source, so a stale cache is never used.
+#
+# With TEMPLATE_WARMUP on, wsgi.py also renders every page once with fixture
+# data at boot. Under gunicorn's preload_app that happens in the master, and
+# the workers inherit the loaded templates.
+
+import os
+from datetime import datetime, timedelta
+
+from flask import render_template
+from jinja2 import FileSystemBytecodeCache
+
+
+def init_app(app):
+    app.config.setdefault('JINJA_BYTECODE_CACHE_DIR', None)
+    app.config.setdefault('TEMPLATE_WARMUP', False)
+    directory = app.config['JINJA_BYTECODE_CACHE_DIR']
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+
+def compile_templates(app):
+    # Loading a template compiles it and, with a bytecode cache configured,
+    # stores the result.
+    names = [name for name in app.jinja_env.list_templates() if name.endswith('.html')]
+    for name in names:
+        app.jinja_env.get_template(name)
+    return names
+
+
+#  Warm-up
+#  ----------------------------------------------------------------
+
+def _fixtures():
+    start = datetime.now().replace(minute=0, second=0, microsecond=0)
+    show = {
+        "id": 1, "version": start, "venue_id": 1, "venue_name": "The Musical Hop", "venue_image_link": "",
+        "artist_id": 1, "artist_name": "Guns N Petals", "artist_image_link": "",
+        "start_time": start
+    }
+    past_show = dict(show, start_time=start - timedelta(days=30))
+    entity = {
+        "id": 1, "genres": ["Jazz", "Reggae"], "city": "San Francisco", "state": "CA",
+        "phone": "123-123-1234", "website": "https://example.com",
+        "facebook_link": "https://www.facebook.com/example", "seeking_description": "",
+        "image_link": "", "past_shows": [past_show], "upcoming_shows": [show],
+        "past_shows_count": 1, "upcoming_shows_count": 1
+    }
+    venue = dict(entity, name="The Musical Hop", address="1015 Folsom Street",
+                 seeking_talent=True)
+    artist = dict(entity, name="Guns N Petals", seeking_venue=True)
+    results = {"count": 1, "data": [{"id": 1, "name": "The Musical Hop"}],
+               "page": 1, "has_next": False}
+    filters = {"genre": ["Jazz"], "state": "CA", "city": None, "seeking": False}
+    facets = {"total": 1, "genres": [{"value": "Jazz", "count": 1}, {"value": "Reggae", "count": 1}],
+              "states": [{"value": "CA", "count": 1}],
+              "cities": [{"value": "San Francisco", "count": 1}], "seeking": 1}
+
+    from forms import VenueForm, ArtistForm, ShowForm, ShowBatchForm
+    return [
+        ('pages/home.html', {"venues": [venue], "artists": [artist]}),
+        ('pages/venues.html', {"areas": [{"city": "San Francisco", "state": "CA", "venues": [
+            {"id": 1, "name": "The Musical Hop", "num_upcoming_shows": 1}]}]}),
+        ('pages/artists.html', {"artists": [{"id": 1, "name": "Guns N Petals",
+                                             "upcoming_shows_count": 1, "updated_at": start}],
+                                "next_cursor": None}),
+        ('pages/shows.html', {"shows": [show], "next_cursor": None, "upcoming": False}),
+        ('pages/show_venue.html', {"venue": venue}),
+        ('pages/show_artist.html', {"artist": artist}),
+        ('pages/browse.html', {"entity": "venue", "endpoint": "main.browse_venues",
+                               "results": [venue], "next_cursor": None, "filters": filters,
+                               "query": dict(filters, seeking=None), "facets": facets}),
+        ('pages/search_venues.html', {"results": results, "search_term": "hop"}),
+        ('pages/search_artists.html', {"results": results, "search_term": "hop"}),
+        ('forms/new_venue.html', {"form": VenueForm()}),
+        ('forms/new_artist.html', {"form": ArtistForm()}),
+        ('forms/new_show.html', {"form": ShowForm()}),
+        ('forms/schedule_shows.html', {"form": ShowBatchForm(), "created": [show],
+                                       "conflicts": [past_show["start_time"]]}),
+        ('forms/edit_venue.html', {"form": VenueForm(), "venue": venue}),
+        ('forms/edit_artist.html', {"form": ArtistForm(), "artist": artist}),
+        ('errors/404.html', {}),
+        ('errors/500.html', {}),
+    ]
+
+
+def warm_up(app):
+    # Renders each page once, which also imports what rendering needs (forms,
+    # Babel) and fills the format caches. Returns the names of the templates
+    # that failed to render; they are logged, not raised, so a bad fixture
+    # can't keep the app from booting.
+    failed = []
+    with app.test_request_context('/'):
+        for name, context in _fixtures():
+            try:
+                render_template(name, **context)
+            except Exception:
+                app.logger.exception('Template warm-up failed for %s', name)
+                failed.append(name)
+    # The fixture tiles must not be served in place of real ones.
+    if 'fragment_cache' in app.extensions:
+        app.extensions['fragment_cache'].backend.clear()
+    compile_templates(app)
+    return failed
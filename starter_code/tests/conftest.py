@@ -0,0 +1,38 @@
+#----------------------------------------------------------------------------#
+# Test fixtures.
+#----------------------------------------------------------------------------#
+
+# The tests run against a real PostgreSQL database, the scratch one the
+# benchmarks use: run `flask db upgrade` against it first. They truncate
+# tables, so never point BENCH_DATABASE_URL at data you want to keep.
+# Without it every test that needs the database is skipped.
+#
+#   BENCH_DATABASE_URL=postgresql://localhost/fyyur_bench python -m pytest tests
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# count_queries, explain and friends are shared with the benchmarks.
+sys.path.insert(0, os.path.join(ROOT, 'bench'))
+
+
+@pytest.fixture(scope='session')
+def app():
+    url = os.environ.get('BENCH_DATABASE_URL')
+    if not url:
+        pytest.skip('Set BENCH_DATABASE_URL to a migrated scratch database.')
+    from app import create_app
+    return create_app({'SQLALCHEMY_DATABASE_URI': url, 'TESTING': True})
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
+        from models import db
+        db.session.rollback()
+        db.session.remove()
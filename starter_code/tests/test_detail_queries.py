@@ -0,0 +1,57 @@
+#----------------------------------------------------------------------------#
+# The venue and artist pages load the entity, its shows and the other side of
+# each show in one statement (queries._detail_query). A lazy relationship
+# creeping back in shows up here as extra statements.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from common import count_queries, truncate
+
+from models import db, Venue, Artist, Show
+from queries import venue_detail, artist_detail
+
+
+@pytest.fixture
+def entities(app_context):
+    truncate('Show', 'Venue', 'Artist')
+    busy_venue = Venue(name='The Musical Hop', city='San Francisco', state='CA')
+    quiet_venue = Venue(name='Empty Room', city='San Francisco', state='CA')
+    busy_artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+    quiet_artist = Artist(name='Nobody Yet', city='San Francisco', state='CA')
+    other_artist = Artist(name='The Wild Sax Band', city='San Francisco', state='CA')
+    db.session.add_all([busy_venue, quiet_venue, busy_artist, quiet_artist, other_artist])
+    db.session.flush()
+
+    now = datetime.utcnow().replace(microsecond=0)
+    for days, artist in ((-30, busy_artist), (-10, other_artist), (10, busy_artist), (20, other_artist)):
+        db.session.add(Show(venue_id=busy_venue.id, artist_id=artist.id,
+                            start_time=now + timedelta(days=days)))
+    db.session.commit()
+    return {'busy_venue': busy_venue.id, 'quiet_venue': quiet_venue.id,
+            'busy_artist': busy_artist.id, 'quiet_artist': quiet_artist.id}
+
+
+@pytest.mark.parametrize('detail, entity, past, upcoming', [
+    (venue_detail, 'busy_venue', 2, 2),
+    (venue_detail, 'quiet_venue', 0, 0),
+    (artist_detail, 'busy_artist', 1, 1),
+    (artist_detail, 'quiet_artist', 0, 0),
+])
+def test_detail_is_one_statement(entities, detail, entity, past, upcoming):
+    db.session.expunge_all()
+    with count_queries() as queries:
+        data = detail(entities[entity])
+
+    assert queries.count == 1, queries.statements
+    assert len(data['past_shows']) == data['past_shows_count'] == past
+    assert len(data['upcoming_shows']) == data['upcoming_shows_count'] == upcoming
+
+
+def test_missing_entity_is_one_statement(entities):
+    with count_queries() as queries:
+        assert venue_detail(0) is None
+        assert artist_detail(0) is None
+    assert queries.count == 2, queries.statements
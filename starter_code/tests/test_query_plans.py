@@ -0,0 +1,103 @@
+#----------------------------------------------------------------------------#
+# Query plan guard: EXPLAIN the statements the hot pages run, against the
+# load-test dataset, and fail if any of them sequentially scans Venue,
+# Artist or Show.
+#
+#   BENCH_DATABASE_URL=postgresql://localhost/fyyur_bench python -m pytest tests/test_query_plans.py
+#
+# Every statement comes from the same queries.* builder the view uses, with
+# the page sizes from config.py, so the guard sees the plan the app gets.
+# Migrations, not models.py, create the indexes being checked: run
+# `flask db upgrade` against the database first. PLAN_GUARD_SCALE (default
+# 10) sets the size of the seeded data; PLAN_GUARD_SEED=0 reuses what is
+# already there.
+#----------------------------------------------------------------------------#
+
+import os
+from datetime import timedelta
+
+import pytest
+
+from common import explain, plan_nodes
+
+from loadtest import seed, GENRES, STATES
+from models import db, Venue, Artist, Show
+from queries import (venue_area_query, artist_rows_query, busiest_artist_rows_query,
+                     search_query, venue_detail_query, venue_version_query,
+                     artist_detail_query, artist_version_query, show_tiles_query,
+                     venue_busy_query, browse_query, facet_counts_query)
+
+LARGE_TABLES = ('Venue', 'Artist', 'Show')
+
+HOT_QUERIES = {
+    'venues': lambda c: venue_area_query(),
+    'artists': lambda c: artist_rows_query(c.config['ARTISTS_PER_PAGE']),
+    'artists after': lambda c: artist_rows_query(c.config['ARTISTS_PER_PAGE'], after=c.artist_id),
+    'artists busiest': lambda c: busiest_artist_rows_query(c.config['ARTISTS_PER_PAGE']),
+    'artists busiest after': lambda c: busiest_artist_rows_query(
+        c.config['ARTISTS_PER_PAGE'], after=(c.artist_count, c.artist_id)),
+    'search_venues': lambda c: search_query(Venue, 'hop', 1, c.config['SEARCH_RESULTS_PER_PAGE']),
+    'search_venues area': lambda c: search_query(Venue, 'City 12', 1,
+                                                 c.config['SEARCH_RESULTS_PER_PAGE']),
+    'search_artists': lambda c: search_query(Artist, 'band', 1, c.config['SEARCH_RESULTS_PER_PAGE']),
+    'show_venue': lambda c: venue_detail_query(c.venue_id),
+    'api_venue version': lambda c: venue_version_query(c.venue_id),
+    'show_artist': lambda c: artist_detail_query(c.artist_id),
+    'api_artist version': lambda c: artist_version_query(c.artist_id),
+    'shows': lambda c: show_tiles_query(c.config['SHOWS_PER_PAGE']),
+    'shows after': lambda c: show_tiles_query(c.config['SHOWS_PER_PAGE'], after=c.middle),
+    'shows upcoming': lambda c: show_tiles_query(c.config['SHOWS_PER_PAGE'], upcoming=True),
+    'browse_venues genres': lambda c: browse_query(Venue, {'genre': GENRES[:2]},
+                                                   c.config['BROWSE_RESULTS_PER_PAGE']),
+    'browse_artists area': lambda c: browse_query(Artist, {'state': STATES[12], 'city': 'City 12'},
+                                                  c.config['BROWSE_RESULTS_PER_PAGE']),
+    'facets genres': lambda c: facet_counts_query(Artist, {'genre': GENRES[:2]}),
+    'venue availability': lambda c: venue_busy_query(
+        c.venue_id, c.middle[0], c.middle[0] + timedelta(days=c.config['AVAILABILITY_MAX_DAYS'])),
+}
+
+
+class Context(object):
+    # Ids and cursors from the middle of the seeded data, so the keyset
+    # queries start somewhere realistic.
+
+    def __init__(self, config):
+        self.config = config
+        self.venue_id = db.session.query(db.func.max(Venue.id)).scalar() // 2
+        self.artist_id = db.session.query(db.func.max(Artist.id)).scalar() // 2
+        self.artist_count = db.session.query(Artist.upcoming_shows_count) \
+            .filter(Artist.id == self.artist_id).scalar()
+        self.middle = tuple(db.session.query(Show.start_time, Show.id)
+                            .order_by(Show.start_time, Show.id)
+                            .offset(db.session.query(Show).count() // 2)
+                            .first())
+
+
+def vacuum():
+    # Sets the visibility map so index-only scans are costed as they would be
+    # on a settled production table.
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        for table in LARGE_TABLES:
+            connection.exec_driver_sql('VACUUM ANALYZE "{}"'.format(table))
+
+
+@pytest.fixture(scope='module')
+def seeded(app):
+    with app.app_context():
+        if os.environ.get('PLAN_GUARD_SEED', '1') != '0':
+            seed(int(os.environ.get('PLAN_GUARD_SCALE', 10)))
+        vacuum()
+        yield Context(app.config)
+        db.session.rollback()
+        db.session.remove()
+
+
+@pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+def test_no_sequential_scan(seeded, name):
+    plan = explain(HOT_QUERIES[name](seeded))
+    scans = ['{} on {}{}'.format(node['Node Type'], node['Relation Name'],
+                                 ' using ' + node['Index Name'] if 'Index Name' in node else '')
+             for node in plan_nodes(plan) if 'Relation Name' in node]
+    sequential = [node['Relation Name'] for node in plan_nodes(plan)
+                  if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in LARGE_TABLES]
+    assert not sequential, '{} sequentially scans {}: {}'.format(name, sequential, '; '.join(scans))
@@ -0,0 +1,19 @@
+#----------------------------------------------------------------------------#
+# Time to first request for a fresh process stays under STARTUP_BUDGET_MS,
+# measured by the same probe as bench/bench_startup.py. Needs no database.
+#----------------------------------------------------------------------------#
+
+import os
+import statistics
+
+from bench_startup import probe
+
+RUNS = 3
+
+
+def test_first_request_within_budget():
+    budget = float(os.environ.get('STARTUP_BUDGET_MS', 750))
+    probe()  # warm the OS file cache and .pyc files
+    median = statistics.median(probe()['total_ms'] for _ in range(RUNS))
+    assert median <= budget, 'time to first request {:.0f}ms is over the {:.0f}ms budget'.format(
+        median, budget)
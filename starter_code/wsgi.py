@@ -0,0 +1,12 @@
+#----------------------------------------------------------------------------#
+# WSGI entry point.
+#----------------------------------------------------------------------------#
+
+#   gunicorn -c gunicorn.conf.py wsgi:app
+
+from app import create_app
+import templating
+
+app = create_app()
+if app.config['TEMPLATE_WARMUP']:
+    templating.warm_up(app)